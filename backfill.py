@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import logging
+import sys
+
+from bot.backfill import Backfiller
+from bot.config import BotConfig, ConfigError, load_config
+from bot.repost_worker import RepostWorkerPool
+from main import (
+    create_attachment_cache,
+    create_attachment_downloader,
+    create_discord_client,
+    create_media_processor,
+    create_repost_queue,
+    create_repost_service,
+    create_routing_table,
+    create_telegram_bot,
+    create_telegram_scheduler,
+    warm_up_telegram,
+)
+
+
+DRAIN_POLL_SECONDS = 1.0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Repost Discord messages that were missed while the bot was down.")
+    parser.add_argument(
+        "--channel",
+        dest="channel_ids",
+        type=int,
+        action="append",
+        help="Discord channel ID to backfill; defaults to every routed channel",
+    )
+    parser.add_argument(
+        "--after",
+        type=int,
+        help="Discord message ID to start after instead of the stored checkpoint",
+    )
+    parser.add_argument("--max-messages", type=int, help="maximum messages to replay per channel")
+    return parser.parse_args(argv)
+
+
+async def run_backfill(config: BotConfig, args: argparse.Namespace) -> None:
+    client = create_discord_client()
+    attachment_downloader = create_attachment_downloader(config)
+    telegram_bot = create_telegram_bot(config)
+    routing = create_routing_table(config, telegram_bot, create_telegram_scheduler(config))
+    attachment_cache = create_attachment_cache(config)
+    media_processor = create_media_processor(config)
+    repost_service = create_repost_service(config, routing, attachment_downloader, attachment_cache, media_processor)
+    repost_queue = create_repost_queue(config)
+    backfiller = Backfiller(
+        repost_queue,
+        repost_service,
+        max_messages_per_channel=args.max_messages or config.backfill_max_messages,
+    )
+    worker_pool = RepostWorkerPool(repost_queue, repost_service, worker_count=config.repost_workers)
+    channel_ids = args.channel_ids or sorted(routing.channel_ids)
+    after = {channel_id: args.after for channel_id in channel_ids} if args.after else None
+
+    await attachment_cache.open()
+    await repost_queue.open()
+    try:
+        await warm_up_telegram(telegram_bot, config)
+        await client.login(config.discord_bot_token)
+        await backfiller.run(client, channel_ids, after)
+        worker_pool.start()
+        while depth := await repost_queue.depth():
+            logging.info("Waiting for %d queued reposts", depth)
+            await asyncio.sleep(DRAIN_POLL_SECONDS)
+    finally:
+        await worker_pool.stop()
+        await client.close()
+        await repost_queue.close()
+        await attachment_cache.close()
+        await attachment_downloader.close()
+        await telegram_bot.shutdown()
+        if media_processor is not None:
+            media_processor.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args(argv)
+
+    try:
+        config = load_config()
+    except ConfigError as error:
+        logging.error("%s", error)
+        sys.exit(1)
+
+    try:
+        asyncio.run(run_backfill(config, args))
+    except KeyboardInterrupt:
+        logging.info("Shutting down")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+from urllib.parse import unquote, urlparse
+
+from aiohttp import web
+
+
+CHUNK_SIZE_BYTES = 64 * 1024
+FILLER_CHUNK = bytes(range(256)) * (CHUNK_SIZE_BYTES // 256)
+MEDIA_FIELDS = {
+    "sendPhoto": "photo",
+    "sendVideo": "video",
+    "sendAnimation": "animation",
+    "sendDocument": "document",
+}
+
+
+@dataclass(frozen=True)
+class FakeServerSettings:
+    latency_seconds: float = 0.0
+    bandwidth_bytes_per_second: float = 0.0
+    rate_limit_ratio: float = 0.0
+    failure_ratio: float = 0.0
+    retry_after_seconds: int = 1
+    seed: int = 0
+
+
+class Throttle:
+    def __init__(self, bytes_per_second: float):
+        self.bytes_per_second = bytes_per_second
+        self._started_at = time.monotonic()
+        self._transferred = 0
+
+    async def consume(self, size: int) -> None:
+        self._transferred += size
+        if not self.bytes_per_second:
+            return
+
+        delay = self._started_at + self._transferred / self.bytes_per_second - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class FakeServer:
+    def __init__(self, settings: FakeServerSettings):
+        self.settings = settings
+        self.requests = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self._random = random.Random(settings.seed)
+        self._runner: web.AppRunner | None = None
+        self._port = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._port}"
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self._port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        if self._runner is None:
+            return
+
+        await self._runner.cleanup()
+        self._runner = None
+
+    def create_app(self) -> web.Application:
+        raise NotImplementedError
+
+    async def _delay(self) -> None:
+        self.requests += 1
+        if self.settings.latency_seconds:
+            await asyncio.sleep(self.settings.latency_seconds)
+
+    def _roll_rate_limit(self) -> bool:
+        if self._random.random() < self.settings.rate_limit_ratio:
+            self.rate_limited += 1
+            return True
+        return False
+
+    def _roll_failure(self) -> bool:
+        if self._random.random() < self.settings.failure_ratio:
+            self.failed += 1
+            return True
+        return False
+
+
+class FakeDiscordCdn(FakeServer):
+    def __init__(self, settings: FakeServerSettings):
+        super().__init__(settings)
+        self.bytes_sent = 0
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/attachments/{attachment_id}/{filename}", self._handle_attachment)
+        return app
+
+    def attachment_url(self, attachment_id: int, filename: str, size: int) -> str:
+        return f"{self.url}/attachments/{attachment_id}/{filename}?size={size}"
+
+    async def _handle_attachment(self, request: web.Request) -> web.StreamResponse:
+        await self._delay()
+        if self._roll_rate_limit():
+            return web.Response(status=429, headers={"Retry-After": str(self.settings.retry_after_seconds)})
+        if self._roll_failure():
+            return web.Response(status=500)
+
+        size = int(request.query["size"])
+        response = web.StreamResponse(headers={"Content-Length": str(size)})
+        await response.prepare(request)
+        throttle = Throttle(self.settings.bandwidth_bytes_per_second)
+        remaining = size
+        while remaining:
+            chunk = FILLER_CHUNK[: min(remaining, CHUNK_SIZE_BYTES)]
+            await response.write(chunk)
+            self.bytes_sent += len(chunk)
+            remaining -= len(chunk)
+            await throttle.consume(len(chunk))
+        await response.write_eof()
+        return response
+
+
+class FakeTelegramApi(FakeServer):
+    def __init__(self, settings: FakeServerSettings):
+        super().__init__(settings)
+        self.bytes_received = 0
+        self.bytes_read_from_disk = 0
+        self.local_paths: list[str] = []
+        self.calls: dict[str, int] = {}
+        self._ids = itertools.count(1)
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle_method)
+        return app
+
+    async def _handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        fields = await self._read_fields(request)
+        missing_path = self._read_local_files(fields)
+        if missing_path:
+            return self._error(400, f"Bad Request: file not found: {missing_path}")
+
+        await self._delay()
+        if method != "getMe" and self._roll_rate_limit():
+            return self._error(
+                429,
+                f"Too Many Requests: retry after {self.settings.retry_after_seconds}",
+                {"retry_after": self.settings.retry_after_seconds},
+            )
+        if method != "getMe" and self._roll_failure():
+            return self._error(500, "Internal Server Error")
+
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+        elif method == "sendMessage":
+            result = self._message(fields, text=fields.get("text", ""))
+        elif method == "sendMediaGroup":
+            result = [
+                self._message(fields, **self._attachment(f"send{item['type'].title()}"))
+                for item in json.loads(fields["media"])
+            ]
+        elif method in MEDIA_FIELDS:
+            result = self._message(fields, **self._attachment(method))
+        else:
+            return self._error(404, "Not Found: method not found")
+        return web.json_response({"ok": True, "result": result})
+
+    async def _read_fields(self, request: web.Request) -> dict[str, str]:
+        if not request.content_type.startswith("multipart/"):
+            form = await request.post()
+            return {name: str(value) for name, value in form.items()}
+
+        fields = {}
+        throttle = Throttle(self.settings.bandwidth_bytes_per_second)
+        reader = await request.multipart()
+        async for part in reader:
+            if part.filename is None:
+                fields[part.name] = await part.text()
+                continue
+
+            while chunk := await part.read_chunk(CHUNK_SIZE_BYTES):
+                self.bytes_received += len(chunk)
+                await throttle.consume(len(chunk))
+        return fields
+
+    def _read_local_files(self, fields: dict[str, str]) -> str | None:
+        uris = [value for value in fields.values() if value.startswith("file://")]
+        if "media" in fields:
+            uris += [item["media"] for item in json.loads(fields["media"]) if item["media"].startswith("file://")]
+
+        for uri in uris:
+            path = unquote(urlparse(uri).path)
+            if not os.path.exists(path):
+                return path
+            self.local_paths.append(path)
+            self.bytes_read_from_disk += os.path.getsize(path)
+        return None
+
+    def _message(self, fields: dict[str, str], **content) -> dict:
+        return {
+            "message_id": next(self._ids),
+            "date": int(time.time()),
+            "chat": {"id": -100, "type": "supergroup", "title": str(fields.get("chat_id", ""))},
+            **content,
+        }
+
+    def _attachment(self, method: str) -> dict:
+        file_id = f"fake-file-{next(self._ids)}"
+        media = {"file_id": file_id, "file_unique_id": file_id}
+        field = MEDIA_FIELDS[method]
+        if field == "photo":
+            return {"photo": [{**media, "width": 1280, "height": 720}]}
+        if field in {"video", "animation"}:
+            return {field: {**media, "width": 1280, "height": 720, "duration": 10}}
+        return {"document": media}
+
+    def _error(self, status: int, description: str, parameters: dict | None = None) -> web.Response:
+        payload = {"ok": False, "error_code": status, "description": description}
+        if parameters:
+            payload["parameters"] = parameters
+        return web.json_response(payload, status=status)
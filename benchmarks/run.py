@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+
+from telegram import Bot
+
+from bot.attachment_downloader import AttachmentDownloader
+from bot.config import (
+    TELEGRAM_CHAT_BURST,
+    TELEGRAM_CHAT_RATE_PER_MINUTE,
+    TELEGRAM_GLOBAL_RATE_PER_SECOND,
+    TelegramTarget,
+    default_routes,
+)
+from bot.media_classifier import DEFAULT_MEDIA_LIMITS, LOCAL_BOT_API_MEDIA_LIMITS
+from bot.repost_service import RepostService
+from bot.routing import RoutingTable
+from bot.telegram_scheduler import TelegramScheduler
+from bot.telegram_sender import TelegramSender
+from bot.telegram_transport import create_transport
+
+from .fakes import FakeDiscordCdn, FakeServerSettings, FakeTelegramApi
+from .scenarios import (
+    MIB,
+    NSFW_CHANNEL_ID,
+    SCENARIOS,
+    SFW_CHANNEL_ID,
+    MessageFactory,
+    MessageSizes,
+    build_messages,
+)
+
+
+BOT_TOKEN = "123456:benchmark"
+MEGABIT_BYTES = 1_000_000 / 8
+
+
+@dataclass(frozen=True)
+class BenchmarkSettings:
+    scenario: str = "mixed"
+    messages: int = 100
+    concurrency: int = 4
+    sizes: MessageSizes = field(default_factory=MessageSizes)
+    cdn: FakeServerSettings = field(default_factory=FakeServerSettings)
+    telegram: FakeServerSettings = field(default_factory=FakeServerSettings)
+    relay_mode: bool = False
+    url_passthrough: bool = True
+    local_mode: bool = False
+    telegram_global_rate_per_second: float = 10_000
+    telegram_chat_rate_per_minute: float = 1_000_000
+    telegram_chat_burst: int = 10_000
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class BenchmarkReport:
+    scenario: str
+    messages: int
+    elapsed_seconds: float
+    messages_per_second: float
+    p50_latency_seconds: float
+    p99_latency_seconds: float
+    max_latency_seconds: float
+    peak_rss_bytes: int
+    downloaded_bytes: int
+    uploaded_bytes: int
+    local_bytes: int
+    telegram_calls: dict[str, int]
+    telegram_rate_limited: int
+    telegram_failed: int
+    telegram_retries: int
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def run_benchmark(settings: BenchmarkSettings) -> BenchmarkReport:
+    cdn = FakeDiscordCdn(settings.cdn)
+    telegram_api = FakeTelegramApi(settings.telegram)
+    await cdn.start()
+    await telegram_api.start()
+    temp_dir = tempfile.mkdtemp(prefix="repost-benchmark-")
+    downloader = AttachmentDownloader(temp_dir, relay_mode=settings.relay_mode)
+    bot = Bot(
+        token=BOT_TOKEN,
+        base_url=f"{telegram_api.url}/bot",
+        local_mode=settings.local_mode,
+        request=create_transport(),
+    )
+    scheduler = TelegramScheduler(
+        global_rate_per_second=settings.telegram_global_rate_per_second,
+        chat_rate_per_minute=settings.telegram_chat_rate_per_minute,
+        chat_burst=settings.telegram_chat_burst,
+    )
+
+    def create_sender(target: TelegramTarget) -> TelegramSender:
+        return TelegramSender(bot=bot, chat_id=target.chat_id, scheduler=scheduler)
+
+    routing = RoutingTable(
+        default_routes("-1001", "-1002", {NSFW_CHANNEL_ID}, {SFW_CHANNEL_ID}),
+        create_sender,
+    )
+    service = RepostService(
+        routing=routing,
+        temp_dir=temp_dir,
+        downloader=downloader,
+        url_passthrough=settings.url_passthrough,
+        limits=LOCAL_BOT_API_MEDIA_LIMITS if settings.local_mode else DEFAULT_MEDIA_LIMITS,
+        local_mode=settings.local_mode,
+    )
+    messages = build_messages(
+        MessageFactory(cdn, settings.sizes),
+        settings.scenario,
+        settings.messages,
+        seed=settings.seed,
+    )
+    semaphore = asyncio.Semaphore(settings.concurrency)
+    latencies: list[float] = []
+
+    async def deliver(message) -> None:
+        async with semaphore:
+            started_at = time.monotonic()
+            await service.handle_message(message)
+            latencies.append(time.monotonic() - started_at)
+
+    try:
+        await bot.initialize()
+        started_at = time.monotonic()
+        await asyncio.gather(*(deliver(message) for message in messages))
+        elapsed = time.monotonic() - started_at
+    finally:
+        await bot.shutdown()
+        await downloader.close()
+        await telegram_api.stop()
+        await cdn.stop()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return BenchmarkReport(
+        scenario=settings.scenario,
+        messages=len(messages),
+        elapsed_seconds=elapsed,
+        messages_per_second=len(messages) / elapsed if elapsed else 0.0,
+        p50_latency_seconds=percentile(latencies, 0.5),
+        p99_latency_seconds=percentile(latencies, 0.99),
+        max_latency_seconds=max(latencies, default=0.0),
+        peak_rss_bytes=peak_rss_bytes(),
+        downloaded_bytes=cdn.bytes_sent,
+        uploaded_bytes=telegram_api.bytes_received,
+        local_bytes=telegram_api.bytes_read_from_disk,
+        telegram_calls=dict(sorted(telegram_api.calls.items())),
+        telegram_rate_limited=telegram_api.rate_limited,
+        telegram_failed=telegram_api.failed,
+        telegram_retries=scheduler.stats.retries,
+    )
+
+
+def format_report(report: BenchmarkReport) -> str:
+    return "\n".join(
+        [
+            f"scenario:         {report.scenario}",
+            f"messages:         {report.messages} in {report.elapsed_seconds:.2f}s",
+            f"throughput:       {report.messages_per_second:.1f} messages/s",
+            f"latency p50:      {report.p50_latency_seconds * 1000:.1f} ms",
+            f"latency p99:      {report.p99_latency_seconds * 1000:.1f} ms",
+            f"latency max:      {report.max_latency_seconds * 1000:.1f} ms",
+            f"peak RSS:         {report.peak_rss_bytes / MIB:.1f} MiB",
+            f"downloaded:       {report.downloaded_bytes / MIB:.1f} MiB",
+            f"uploaded:         {report.uploaded_bytes / MIB:.1f} MiB",
+            f"read from disk:   {report.local_bytes / MIB:.1f} MiB",
+            f"telegram calls:   {report.telegram_calls}",
+            f"429s/failures:    {report.telegram_rate_limited} / {report.telegram_failed}",
+            f"retries:          {report.telegram_retries}",
+        ]
+    )
+
+
+def server_settings(args: argparse.Namespace, prefix: str) -> FakeServerSettings:
+    return FakeServerSettings(
+        latency_seconds=getattr(args, f"{prefix}_latency_ms") / 1000,
+        bandwidth_bytes_per_second=getattr(args, f"{prefix}_bandwidth_mbps") * MEGABIT_BYTES,
+        rate_limit_ratio=getattr(args, f"{prefix}_429_ratio"),
+        failure_ratio=getattr(args, f"{prefix}_failure_ratio"),
+        retry_after_seconds=args.retry_after_seconds,
+        seed=args.seed,
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the repost pipeline against fake Discord and Telegram servers.",
+    )
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--photo-mb", type=float, default=2)
+    parser.add_argument("--video-mb", type=float, default=40)
+    parser.add_argument("--album-size", type=int, default=4)
+    for prefix in ("cdn", "telegram"):
+        parser.add_argument(f"--{prefix}-latency-ms", type=float, default=0)
+        parser.add_argument(f"--{prefix}-bandwidth-mbps", type=float, default=0, help="0 means unlimited")
+        parser.add_argument(f"--{prefix}-429-ratio", type=float, default=0)
+        parser.add_argument(f"--{prefix}-failure-ratio", type=float, default=0)
+    parser.add_argument("--retry-after-seconds", type=int, default=1)
+    parser.add_argument("--relay-mode", action="store_true")
+    parser.add_argument("--no-url-passthrough", dest="url_passthrough", action="store_false")
+    parser.add_argument("--local-mode", action="store_true", help="send file paths as to a local Bot API server")
+    parser.add_argument("--realistic-rate-limits", action="store_true", help="use the bot's Telegram rate limits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    rate_limits = {}
+    if args.realistic_rate_limits:
+        rate_limits = {
+            "telegram_global_rate_per_second": TELEGRAM_GLOBAL_RATE_PER_SECOND,
+            "telegram_chat_rate_per_minute": TELEGRAM_CHAT_RATE_PER_MINUTE,
+            "telegram_chat_burst": TELEGRAM_CHAT_BURST,
+        }
+    settings = BenchmarkSettings(
+        scenario=args.scenario,
+        messages=args.messages,
+        concurrency=args.concurrency,
+        sizes=MessageSizes(
+            photo_bytes=int(args.photo_mb * MIB),
+            video_bytes=int(args.video_mb * MIB),
+            album_size=args.album_size,
+        ),
+        cdn=server_settings(args, "cdn"),
+        telegram=server_settings(args, "telegram"),
+        relay_mode=args.relay_mode,
+        url_passthrough=args.url_passthrough,
+        local_mode=args.local_mode,
+        seed=args.seed,
+        **rate_limits,
+    )
+    report = asyncio.run(run_benchmark(settings))
+    print(json.dumps(asdict(report), indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import itertools
+import random
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Callable
+
+from .fakes import FakeDiscordCdn
+
+
+NSFW_CHANNEL_ID = 1
+SFW_CHANNEL_ID = 2
+MIB = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class MessageSizes:
+    photo_bytes: int = 2 * MIB
+    video_bytes: int = 40 * MIB
+    album_size: int = 4
+
+
+class MessageFactory:
+    def __init__(self, cdn: FakeDiscordCdn, sizes: MessageSizes):
+        self.cdn = cdn
+        self.sizes = sizes
+        self._ids = itertools.count(1)
+
+    def text(self, channel_id: int = NSFW_CHANNEL_ID):
+        return self._message(channel_id, "benchmark text post", [])
+
+    def album(self, channel_id: int = NSFW_CHANNEL_ID):
+        attachments = [
+            self._attachment(f"photo-{index}.jpg", "image/jpeg", self.sizes.photo_bytes)
+            for index in range(self.sizes.album_size)
+        ]
+        return self._message(channel_id, "benchmark album", attachments)
+
+    def video(self, channel_id: int = NSFW_CHANNEL_ID):
+        attachment = self._attachment("video.mp4", "video/mp4", self.sizes.video_bytes)
+        return self._message(channel_id, "benchmark video", [attachment])
+
+    def sfw(self):
+        return self.album(SFW_CHANNEL_ID)
+
+    def _message(self, channel_id: int, content: str, attachments: list):
+        return SimpleNamespace(
+            id=next(self._ids),
+            author=SimpleNamespace(id=1, bot=False),
+            channel=SimpleNamespace(id=channel_id),
+            type=None,
+            content=content,
+            attachments=attachments,
+        )
+
+    def _attachment(self, filename: str, content_type: str, size: int):
+        attachment_id = next(self._ids)
+        return SimpleNamespace(
+            id=attachment_id,
+            filename=filename,
+            content_type=content_type,
+            size=size,
+            url=self.cdn.attachment_url(attachment_id, filename, size),
+        )
+
+
+SCENARIOS: dict[str, dict[str, int]] = {
+    "text": {"text": 1},
+    "album": {"album": 1},
+    "video": {"video": 1},
+    "sfw": {"sfw": 1},
+    "mixed": {"text": 6, "album": 2, "sfw": 1, "video": 1},
+}
+
+
+def build_messages(factory: MessageFactory, scenario: str, count: int, seed: int = 0) -> list:
+    weights = SCENARIOS[scenario]
+    builders: dict[str, Callable] = {
+        "text": factory.text,
+        "album": factory.album,
+        "video": factory.video,
+        "sfw": factory.sfw,
+    }
+    kinds = random.Random(seed).choices(list(weights), weights=list(weights.values()), k=count)
+    return [builders[kind]() for kind in kinds]
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from .media_classifier import TelegramFileKind
+
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class CachedFile:
+    sha256: str
+    kind: TelegramFileKind
+    telegram_file_id: str
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class AttachmentCache:
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.stats = CacheStats()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="attachment-cache")
+        self._connection: sqlite3.Connection | None = None
+
+    async def open(self) -> None:
+        await self._run(self._open)
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+    async def lookup_attachments(self, attachment_ids: list[int]) -> dict[int, CachedFile]:
+        cached_files = await self._run(self._lookup_attachments, attachment_ids)
+        self._record_lookup(len(attachment_ids), len(cached_files))
+        return cached_files
+
+    async def lookup_hashes(self, hashes: list[str]) -> dict[str, CachedFile]:
+        cached_files = await self._run(self._lookup_hashes, hashes)
+        self._record_lookup(len(hashes), len(cached_files))
+        return cached_files
+
+    async def remember_attachments(self, hashes_by_attachment: dict[int, str]) -> None:
+        await self._run(self._remember_attachments, hashes_by_attachment)
+
+    async def store(self, cached_files: list[CachedFile]) -> None:
+        evicted = await self._run(self._store, cached_files)
+        if evicted:
+            self.stats.evictions += evicted
+            logging.info("Evicted %d entries from attachment cache", evicted)
+
+    async def forget(self, hashes: list[str]) -> None:
+        await self._run(self._forget, hashes)
+
+    def _record_lookup(self, requested: int, found: int) -> None:
+        self.stats.hits += found
+        self.stats.misses += requested - found
+
+    async def _run(self, function: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS attachment_hashes (
+                attachment_id INTEGER PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS telegram_files (
+                sha256 TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                telegram_file_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS telegram_files_used_at ON telegram_files (used_at)")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS attachment_hashes_created_at ON attachment_hashes (created_at)"
+        )
+        self._connection = connection
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _lookup_attachments(self, attachment_ids: list[int]) -> dict[int, CachedFile]:
+        if not attachment_ids:
+            return {}
+
+        placeholders = ", ".join("?" for _ in attachment_ids)
+        rows = self._connection.execute(
+            f"""
+            SELECT attachment_hashes.attachment_id, telegram_files.sha256, kind, telegram_file_id
+            FROM attachment_hashes JOIN telegram_files USING (sha256)
+            WHERE attachment_hashes.attachment_id IN ({placeholders}) AND telegram_files.created_at >= ?
+            """,
+            (*attachment_ids, self.clock() - self.ttl_seconds),
+        ).fetchall()
+        cached_files = {
+            attachment_id: CachedFile(sha256, TelegramFileKind(kind), telegram_file_id)
+            for attachment_id, sha256, kind, telegram_file_id in rows
+        }
+        self._touch([cached_file.sha256 for cached_file in cached_files.values()])
+        return cached_files
+
+    def _lookup_hashes(self, hashes: list[str]) -> dict[str, CachedFile]:
+        if not hashes:
+            return {}
+
+        placeholders = ", ".join("?" for _ in hashes)
+        rows = self._connection.execute(
+            f"""
+            SELECT sha256, kind, telegram_file_id FROM telegram_files
+            WHERE sha256 IN ({placeholders}) AND created_at >= ?
+            """,
+            (*hashes, self.clock() - self.ttl_seconds),
+        ).fetchall()
+        cached_files = {
+            sha256: CachedFile(sha256, TelegramFileKind(kind), telegram_file_id)
+            for sha256, kind, telegram_file_id in rows
+        }
+        self._touch(list(cached_files))
+        return cached_files
+
+    def _touch(self, hashes: list[str]) -> None:
+        if not hashes:
+            return
+
+        self._connection.executemany(
+            "UPDATE telegram_files SET used_at = ? WHERE sha256 = ?",
+            [(self.clock(), sha256) for sha256 in hashes],
+        )
+
+    def _remember_attachments(self, hashes_by_attachment: dict[int, str]) -> None:
+        now = self.clock()
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO attachment_hashes (attachment_id, sha256, created_at) VALUES (?, ?, ?)",
+            [(attachment_id, sha256, now) for attachment_id, sha256 in hashes_by_attachment.items()],
+        )
+
+    def _store(self, cached_files: list[CachedFile]) -> int:
+        now = self.clock()
+        self._connection.executemany(
+            """
+            INSERT OR REPLACE INTO telegram_files (sha256, kind, telegram_file_id, created_at, used_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [
+                (cached_file.sha256, cached_file.kind.value, cached_file.telegram_file_id, now, now)
+                for cached_file in cached_files
+            ],
+        )
+        return self._evict(now)
+
+    def _evict(self, now: float) -> int:
+        expired_before = now - self.ttl_seconds
+        evicted = self._connection.execute(
+            "DELETE FROM telegram_files WHERE created_at < ?",
+            (expired_before,),
+        ).rowcount
+        evicted += self._connection.execute(
+            """
+            DELETE FROM telegram_files WHERE sha256 IN (
+                SELECT sha256 FROM telegram_files ORDER BY used_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        ).rowcount
+        self._connection.execute(
+            "DELETE FROM attachment_hashes WHERE created_at < ?",
+            (expired_before,),
+        )
+        self._connection.execute(
+            """
+            DELETE FROM attachment_hashes WHERE attachment_id IN (
+                SELECT attachment_id FROM attachment_hashes ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+        return evicted
+
+    def _forget(self, hashes: list[str]) -> None:
+        self._connection.executemany(
+            "DELETE FROM telegram_files WHERE sha256 = ?",
+            [(sha256,) for sha256 in hashes],
+        )
@@ -1,25 +1,113 @@
+import asyncio
+import hashlib
 import logging
 import os
+import tempfile
+import uuid
 
 import aiohttp
 
 from .local_file import LocalFile
 from .media_classifier import is_spoiler_filename
+from .metrics import DOWNLOADED_BYTES_TOTAL
 
 
-async def download_attachments_to_temp_dir(attachments, temp_dir: str) -> list[LocalFile]:
-    logging.info("Downloading %d attachments to temp directory: %s/", len(attachments), temp_dir)
-    os.makedirs(temp_dir, exist_ok=True)
-    local_files: list[LocalFile] = []
+DEFAULT_DOWNLOAD_CONCURRENCY = 4
+DEFAULT_DOWNLOAD_CONCURRENCY_GLOBAL = 8
+DEFAULT_CONNECTION_LIMIT = 32
+DEFAULT_CONNECTION_LIMIT_PER_HOST = 16
+DEFAULT_DNS_CACHE_TTL_SECONDS = 300
+DEFAULT_KEEPALIVE_TIMEOUT_SECONDS = 60.0
+DEFAULT_CHUNK_SIZE_BYTES = 256 * 1024
+DEFAULT_RELAY_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+DOWNLOAD_TIMEOUT_SECONDS = 30
+DOWNLOADS_DIRNAME = "downloads"
+PARTIAL_SUFFIX = ".part"
 
-    timeout = aiohttp.ClientTimeout(total=30)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        for index, attachment in enumerate(attachments):
+
+class AttachmentDownloader:
+    def __init__(
+        self,
+        temp_dir: str,
+        max_concurrency_per_message: int = DEFAULT_DOWNLOAD_CONCURRENCY,
+        max_concurrency: int = DEFAULT_DOWNLOAD_CONCURRENCY_GLOBAL,
+        connection_limit: int = DEFAULT_CONNECTION_LIMIT,
+        connection_limit_per_host: int = DEFAULT_CONNECTION_LIMIT_PER_HOST,
+        dns_cache_ttl_seconds: int = DEFAULT_DNS_CACHE_TTL_SECONDS,
+        keepalive_timeout_seconds: float = DEFAULT_KEEPALIVE_TIMEOUT_SECONDS,
+        chunk_size_bytes: int = DEFAULT_CHUNK_SIZE_BYTES,
+        relay_mode: bool = False,
+        relay_spool_max_bytes: int = DEFAULT_RELAY_SPOOL_MAX_BYTES,
+    ):
+        self.temp_dir = temp_dir
+        self.download_dir = os.path.join(temp_dir, DOWNLOADS_DIRNAME)
+        self.max_concurrency_per_message = max_concurrency_per_message
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.dns_cache_ttl_seconds = dns_cache_ttl_seconds
+        self.keepalive_timeout_seconds = keepalive_timeout_seconds
+        self.chunk_size_bytes = chunk_size_bytes
+        self.relay_mode = relay_mode
+        self.relay_spool_max_bytes = relay_spool_max_bytes
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: aiohttp.ClientSession | None = None
+
+    async def download_to_temp_dir(self, attachments) -> list[LocalFile]:
+        if self.relay_mode:
+            logging.info("Relaying %d attachments through spooled buffers", len(attachments))
+        else:
+            logging.info("Downloading %d attachments to temp directory: %s/", len(attachments), self.download_dir)
+        await asyncio.to_thread(os.makedirs, self.download_dir, exist_ok=True)
+        session = self._get_session()
+        message_semaphore = asyncio.Semaphore(self.max_concurrency_per_message)
+
+        results = await asyncio.gather(
+            *(
+                self._download_attachment(session, attachment, index, len(attachments), message_semaphore)
+                for index, attachment in enumerate(attachments)
+            )
+        )
+
+        local_files = [local_file for local_file in results if local_file is not None]
+        logging.info("Successfully downloaded %d/%d attachments", len(local_files), len(attachments))
+        return local_files
+
+    async def close(self) -> None:
+        if self._session is None:
+            return
+
+        logging.info("Closing attachment download session")
+        await self._session.close()
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl_seconds,
+                keepalive_timeout=self.keepalive_timeout_seconds,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT_SECONDS),
+            )
+        return self._session
+
+    async def _download_attachment(
+        self,
+        session: aiohttp.ClientSession,
+        attachment,
+        index: int,
+        total: int,
+        message_semaphore: asyncio.Semaphore,
+    ) -> LocalFile | None:
+        async with message_semaphore, self.semaphore:
             try:
                 logging.info(
                     "Downloading attachment %d/%d: %s (size: %d bytes, content_type: %s)",
                     index + 1,
-                    len(attachments),
+                    total,
                     attachment.filename,
                     attachment.size,
                     attachment.content_type,
@@ -32,46 +120,116 @@ async def download_attachments_to_temp_dir(attachments, temp_dir: str) -> list[L
                             attachment.filename,
                             response.status,
                         )
-                        continue
+                        return None
 
-                    content = await response.read()
-                    file_path = os.path.join(temp_dir, attachment.filename)
-                    with open(file_path, "wb") as file:
-                        file.write(content)
+                    if self.relay_mode:
+                        file_path = None
+                        buffer = tempfile.SpooledTemporaryFile(
+                            max_size=self.relay_spool_max_bytes,
+                            dir=self.download_dir,
+                        )
+                        downloaded_size, sha256 = await self._stream_to_buffer(response, buffer)
+                    else:
+                        file_path = self._download_path(attachment)
+                        buffer = None
+                        downloaded_size, sha256 = await self._stream_to_file(response, file_path)
 
-                if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+                if downloaded_size == 0:
                     logging.error(
                         "Failed to save attachment %s: file is empty or doesn't exist",
                         attachment.filename,
                     )
-                    continue
-
-                local_files.append(
-                    LocalFile(
-                        path=file_path,
-                        filename=attachment.filename,
-                        content_type=attachment.content_type,
-                        has_spoiler=is_spoiler_filename(attachment.filename),
-                    )
-                )
+                    if buffer is not None:
+                        await asyncio.to_thread(buffer.close)
+                    else:
+                        await asyncio.to_thread(_remove_if_exists, file_path)
+                    return None
+
+                DOWNLOADED_BYTES_TOTAL.inc(downloaded_size)
                 logging.info(
                     "Successfully downloaded attachment %s (%d bytes)",
                     attachment.filename,
-                    os.path.getsize(file_path),
+                    downloaded_size,
+                )
+                return LocalFile(
+                    path=file_path,
+                    filename=attachment.filename,
+                    content_type=attachment.content_type,
+                    has_spoiler=is_spoiler_filename(attachment.filename),
+                    attachment_id=attachment.id,
+                    size=downloaded_size,
+                    sha256=sha256,
+                    buffer=buffer,
                 )
             except Exception as error:
                 logging.error("Error downloading attachment %s: %s", attachment.filename, error)
                 logging.error("Exception details:", exc_info=True)
+                return None
+
+    def _download_path(self, attachment) -> str:
+        filename = os.path.basename(attachment.filename) or "attachment"
+        return os.path.join(self.download_dir, f"{attachment.id}-{filename}")
+
+    async def _stream_to_file(self, response: aiohttp.ClientResponse, file_path: str) -> tuple[int, str]:
+        downloaded_size = 0
+        digest = hashlib.sha256()
+        partial_path = f"{file_path}.{uuid.uuid4().hex}{PARTIAL_SUFFIX}"
+        file = await asyncio.to_thread(open, partial_path, "wb")
+        try:
+            async for chunk in response.content.iter_chunked(self.chunk_size_bytes):
+                await asyncio.to_thread(_write_chunk, file, digest, chunk)
+                downloaded_size += len(chunk)
+            await asyncio.to_thread(file.close)
+            await asyncio.to_thread(os.replace, partial_path, file_path)
+        except BaseException:
+            await asyncio.to_thread(file.close)
+            await asyncio.to_thread(_remove_if_exists, partial_path)
+            raise
+        return downloaded_size, digest.hexdigest()
 
-    logging.info("Successfully downloaded %d/%d attachments", len(local_files), len(attachments))
-    return local_files
+    async def _stream_to_buffer(self, response: aiohttp.ClientResponse, buffer) -> tuple[int, str]:
+        downloaded_size = 0
+        digest = hashlib.sha256()
+        try:
+            async for chunk in response.content.iter_chunked(self.chunk_size_bytes):
+                await asyncio.to_thread(_write_chunk, buffer, digest, chunk)
+                downloaded_size += len(chunk)
+        except BaseException:
+            await asyncio.to_thread(buffer.close)
+            raise
+        return downloaded_size, digest.hexdigest()
+
+
+def _write_chunk(file, digest, chunk: bytes) -> None:
+    file.write(chunk)
+    digest.update(chunk)
+
+
+def _remove_if_exists(file_path: str) -> None:
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_files(local_files: list[LocalFile]) -> int:
+    failed = 0
+    for local_file in local_files:
+        try:
+            if local_file.buffer is not None:
+                local_file.buffer.close()
+            if local_file.path:
+                _remove_if_exists(local_file.path)
+        except Exception as error:
+            failed += 1
+            logging.error("Error removing downloaded file %s: %s", local_file.path or local_file.filename, error)
+    return failed
 
 
 async def remove_downloaded_files(local_files: list[LocalFile], temp_dir: str) -> None:
     logging.info("Removing downloaded files from temp directory: %s/", temp_dir)
-    try:
-        for local_file in local_files:
-            os.remove(local_file.path)
-    except Exception as error:
-        logging.error("Error removing downloaded files: %s", error)
-    logging.info("Removed downloaded files from temp directory: %s/", temp_dir)
+    failed = await asyncio.to_thread(_remove_files, local_files)
+    if failed:
+        logging.warning("Left %d files in temp directory for the janitor: %s/", failed, temp_dir)
+    else:
+        logging.info("Removed downloaded files from temp directory: %s/", temp_dir)
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from typing import Iterable
+
+import discord
+
+from .repost_job import RepostJob, job_from_message
+from .repost_queue import RepostQueue
+from .repost_service import RepostService
+
+
+DEFAULT_MAX_MESSAGES_PER_CHANNEL = 1000
+ENQUEUE_BATCH_SIZE = 100
+
+
+class Backfiller:
+    def __init__(
+        self,
+        queue: RepostQueue,
+        repost_service: RepostService,
+        max_messages_per_channel: int = DEFAULT_MAX_MESSAGES_PER_CHANNEL,
+    ):
+        self.queue = queue
+        self.repost_service = repost_service
+        self.max_messages_per_channel = max_messages_per_channel
+
+    async def run(
+        self,
+        client: discord.Client,
+        channel_ids: Iterable[int],
+        after: dict[int, int] | None = None,
+    ) -> int:
+        start_after = await self.queue.checkpoints()
+        start_after.update(after or {})
+        channel_ids = [channel_id for channel_id in channel_ids if channel_id in start_after]
+        if not channel_ids:
+            logging.info("No checkpoints to backfill from")
+            return 0
+
+        self.queue.pause_channels(channel_ids)
+        counts = await asyncio.gather(
+            *(self._backfill_channel(client, channel_id, start_after[channel_id]) for channel_id in channel_ids)
+        )
+        total = sum(counts)
+        logging.info("Backfill queued %d missed messages from %d channels", total, len(channel_ids))
+        return total
+
+    async def _backfill_channel(self, client: discord.Client, channel_id: int, after_message_id: int) -> int:
+        queued = 0
+        try:
+            channel = client.get_channel(channel_id) or await client.fetch_channel(channel_id)
+            jobs: list[RepostJob] = []
+            seen = 0
+            async for message in channel.history(
+                limit=self.max_messages_per_channel,
+                after=discord.Object(id=after_message_id),
+                oldest_first=True,
+            ):
+                seen += 1
+                if self.repost_service.accepts(message):
+                    jobs.append(job_from_message(message))
+                if len(jobs) >= ENQUEUE_BATCH_SIZE:
+                    queued += await self.queue.enqueue_many(jobs)
+                    jobs = []
+            if jobs:
+                queued += await self.queue.enqueue_many(jobs)
+
+            if seen >= self.max_messages_per_channel:
+                logging.warning(
+                    "Backfill for channel %d stopped after %d messages, later missed posts are not replayed",
+                    channel_id,
+                    seen,
+                )
+            if queued:
+                logging.info("Backfill queued %d messages from channel %d", queued, channel_id)
+        except discord.DiscordException as error:
+            logging.error("Could not backfill channel %d: %s", channel_id, error)
+        finally:
+            self.queue.resume_channels([channel_id])
+        return queued
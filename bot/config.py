@@ -1,26 +1,125 @@
+import json
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Mapping
 
 import dotenv
 
 
 TEMP_DIR = "temp"
+REPOST_QUEUE_PATH = os.path.join(TEMP_DIR, "repost_queue.sqlite3")
+REPOST_WORKERS = 4
+REPOST_MAX_ATTEMPTS = 5
+REPOST_COALESCE_WINDOW_MS = 0
+REPOST_COALESCE_MAX_MESSAGES = 10
+ATTACHMENT_CACHE_PATH = os.path.join(TEMP_DIR, "attachment_cache.sqlite3")
+ATTACHMENT_CACHE_MAX_ENTRIES = 10_000
+ATTACHMENT_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+DOWNLOAD_CONCURRENCY_PER_MESSAGE = 4
+DOWNLOAD_CONCURRENCY_GLOBAL = 8
+DOWNLOAD_CONNECTION_LIMIT = 32
+DOWNLOAD_CONNECTION_LIMIT_PER_HOST = 16
+DOWNLOAD_DNS_CACHE_TTL_SECONDS = 300
+DOWNLOAD_KEEPALIVE_TIMEOUT_SECONDS = 60
+DOWNLOAD_CHUNK_SIZE_BYTES = 256 * 1024
+TEMP_JANITOR_INTERVAL_SECONDS = 300
+TEMP_MAX_AGE_SECONDS = 60 * 60
+TEMP_QUOTA_BYTES = 1024 * 1024 * 1024
+RELAY_MODE = False
+RELAY_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+URL_PASSTHROUGH = True
+MEDIA_PROCESSING = False
+MEDIA_PROCESSING_WORKERS = 2
+MEDIA_PROCESSING_TIMEOUT_SECONDS = 120
+MEDIA_PROCESSING_MAX_INPUT_BYTES = 500 * 1024 * 1024
+TELEGRAM_GLOBAL_RATE_PER_SECOND = 30
+TELEGRAM_CHAT_RATE_PER_MINUTE = 20
+TELEGRAM_CHAT_BURST = 5
+TELEGRAM_MAX_RETRIES = 3
+TELEGRAM_CONNECTION_POOL_SIZE = 16
+TELEGRAM_API_URL = "https://api.telegram.org/bot"
+TELEGRAM_LOCAL_MODE = False
+TELEGRAM_READ_TIMEOUT_SECONDS = 5
+TELEGRAM_LOCAL_MODE_READ_TIMEOUT_SECONDS = 600
+TELEGRAM_UPLOAD_POOL_SIZE = 4
+TELEGRAM_UPLOAD_READ_TIMEOUT_SECONDS = 120
+TELEGRAM_UPLOAD_WRITE_TIMEOUT_SECONDS = 300
+TELEGRAM_HTTP2 = False
+TELEGRAM_WARM_UP_CONNECTIONS = 4
+LOOP_LAG_WARNING_MS = 100
+BACKFILL_ON_STARTUP = True
+BACKFILL_MAX_MESSAGES = 1000
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 0
 
 
 class ConfigError(ValueError):
     pass
 
 
+@dataclass(frozen=True)
+class TelegramTarget:
+    chat_id: str
+    topic_id: int | None = None
+
+
+Routes = dict[int, tuple[TelegramTarget, ...]]
+
+
 @dataclass(frozen=True)
 class BotConfig:
     telegram_bot_token: str
-    telegram_nsfw_chat_id: str
-    telegram_sfw_chat_id: str
+    telegram_nsfw_chat_id: str | None
+    telegram_sfw_chat_id: str | None
     discord_bot_token: str
     discord_nsfw_channel_ids: set[int]
     discord_sfw_channel_ids: set[int]
+    routes: Routes = field(default_factory=dict)
+    routes_path: str | None = None
     temp_dir: str = TEMP_DIR
+    repost_queue_path: str = REPOST_QUEUE_PATH
+    repost_workers: int = REPOST_WORKERS
+    repost_max_attempts: int = REPOST_MAX_ATTEMPTS
+    repost_coalesce_window_ms: int = REPOST_COALESCE_WINDOW_MS
+    repost_coalesce_max_messages: int = REPOST_COALESCE_MAX_MESSAGES
+    attachment_cache_path: str = ATTACHMENT_CACHE_PATH
+    attachment_cache_max_entries: int = ATTACHMENT_CACHE_MAX_ENTRIES
+    attachment_cache_ttl_seconds: int = ATTACHMENT_CACHE_TTL_SECONDS
+    download_concurrency_per_message: int = DOWNLOAD_CONCURRENCY_PER_MESSAGE
+    download_concurrency_global: int = DOWNLOAD_CONCURRENCY_GLOBAL
+    download_connection_limit: int = DOWNLOAD_CONNECTION_LIMIT
+    download_connection_limit_per_host: int = DOWNLOAD_CONNECTION_LIMIT_PER_HOST
+    download_dns_cache_ttl_seconds: int = DOWNLOAD_DNS_CACHE_TTL_SECONDS
+    download_keepalive_timeout_seconds: int = DOWNLOAD_KEEPALIVE_TIMEOUT_SECONDS
+    download_chunk_size_bytes: int = DOWNLOAD_CHUNK_SIZE_BYTES
+    temp_janitor_interval_seconds: int = TEMP_JANITOR_INTERVAL_SECONDS
+    temp_max_age_seconds: int = TEMP_MAX_AGE_SECONDS
+    temp_quota_bytes: int = TEMP_QUOTA_BYTES
+    relay_mode: bool = RELAY_MODE
+    url_passthrough: bool = URL_PASSTHROUGH
+    media_processing: bool = MEDIA_PROCESSING
+    media_processing_workers: int = MEDIA_PROCESSING_WORKERS
+    media_processing_timeout_seconds: int = MEDIA_PROCESSING_TIMEOUT_SECONDS
+    media_processing_max_input_bytes: int = MEDIA_PROCESSING_MAX_INPUT_BYTES
+    relay_spool_max_bytes: int = RELAY_SPOOL_MAX_BYTES
+    telegram_global_rate_per_second: int = TELEGRAM_GLOBAL_RATE_PER_SECOND
+    telegram_chat_rate_per_minute: int = TELEGRAM_CHAT_RATE_PER_MINUTE
+    telegram_chat_burst: int = TELEGRAM_CHAT_BURST
+    telegram_max_retries: int = TELEGRAM_MAX_RETRIES
+    telegram_connection_pool_size: int = TELEGRAM_CONNECTION_POOL_SIZE
+    telegram_api_url: str = TELEGRAM_API_URL
+    telegram_local_mode: bool = TELEGRAM_LOCAL_MODE
+    telegram_read_timeout_seconds: int = TELEGRAM_READ_TIMEOUT_SECONDS
+    telegram_upload_pool_size: int = TELEGRAM_UPLOAD_POOL_SIZE
+    telegram_upload_read_timeout_seconds: int = TELEGRAM_UPLOAD_READ_TIMEOUT_SECONDS
+    telegram_upload_write_timeout_seconds: int = TELEGRAM_UPLOAD_WRITE_TIMEOUT_SECONDS
+    telegram_http2: bool = TELEGRAM_HTTP2
+    telegram_warm_up_connections: int = TELEGRAM_WARM_UP_CONNECTIONS
+    loop_lag_warning_ms: int = LOOP_LAG_WARNING_MS
+    backfill_on_startup: bool = BACKFILL_ON_STARTUP
+    backfill_max_messages: int = BACKFILL_MAX_MESSAGES
+    metrics_host: str = METRICS_HOST
+    metrics_port: int = METRICS_PORT
 
 
 def parse_allowed_channel_ids(raw_value: str | None) -> set[int]:
@@ -30,6 +129,98 @@ def parse_allowed_channel_ids(raw_value: str | None) -> set[int]:
     return {int(channel_id.strip()) for channel_id in raw_value.split(",")}
 
 
+def add_route(routes: Routes, channel_id: int, targets: list[TelegramTarget]) -> None:
+    routes[channel_id] = tuple(dict.fromkeys((*routes.get(channel_id, ()), *targets)))
+
+
+def default_routes(
+    nsfw_chat_id: str,
+    sfw_chat_id: str,
+    nsfw_channel_ids: set[int],
+    sfw_channel_ids: set[int],
+) -> Routes:
+    nsfw_target = TelegramTarget(nsfw_chat_id)
+    sfw_target = TelegramTarget(sfw_chat_id)
+    routes: Routes = {}
+
+    for channel_id in nsfw_channel_ids:
+        add_route(routes, channel_id, [nsfw_target])
+
+    for channel_id in sfw_channel_ids:
+        add_route(routes, channel_id, [nsfw_target, sfw_target])
+
+    return routes
+
+
+def parse_routes(data) -> Routes:
+    if not isinstance(data, dict) or not isinstance(data.get("routes"), list):
+        raise ConfigError("routes file must contain a \"routes\" list")
+
+    routes: Routes = {}
+    for index, route in enumerate(data["routes"]):
+        try:
+            channel_ids = [int(channel_id) for channel_id in route["discord_channel_ids"]]
+            targets = [
+                TelegramTarget(
+                    chat_id=str(target["chat_id"]),
+                    topic_id=int(target["topic_id"]) if target.get("topic_id") is not None else None,
+                )
+                for target in route["telegram_targets"]
+            ]
+        except (KeyError, TypeError, ValueError) as error:
+            raise ConfigError(f"route {index} is invalid: {error!r}") from error
+
+        for channel_id in channel_ids:
+            add_route(routes, channel_id, targets)
+
+    return routes
+
+
+def load_routes(path: str) -> Routes:
+    try:
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, json.JSONDecodeError) as error:
+        raise ConfigError(f"could not read routes file {path}: {error}") from error
+
+    return parse_routes(data)
+
+
+def parse_positive_int(env: Mapping[str, str | None], key: str, default: int) -> int:
+    raw_value = env.get(key)
+    if not raw_value or not raw_value.strip():
+        return default
+
+    value = int(raw_value.strip())
+    if value <= 0:
+        raise ConfigError(f"{key} must be a positive integer")
+    return value
+
+
+def parse_non_negative_int(env: Mapping[str, str | None], key: str, default: int) -> int:
+    raw_value = env.get(key)
+    if not raw_value or not raw_value.strip():
+        return default
+
+    value = int(raw_value.strip())
+    if value < 0:
+        raise ConfigError(f"{key} must not be negative")
+    return value
+
+
+def parse_bool(env: Mapping[str, str | None], key: str, default: bool) -> bool:
+    raw_value = env.get(key)
+    if not raw_value or not raw_value.strip():
+        return default
+
+    value = raw_value.strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    raise ConfigError(f"{key} must be a boolean (true or false)")
+
+
 def require_env(env: Mapping[str, str | None], key: str) -> str:
     value = env.get(key)
     if not value:
@@ -41,11 +232,164 @@ def load_config(env: Mapping[str, str | None] | None = None) -> BotConfig:
     dotenv.load_dotenv()
     source = env if env is not None else os.environ
 
+    telegram_bot_token = require_env(source, "TELEGRAM_BOT_TOKEN")
+    discord_bot_token = require_env(source, "DISCORD_BOT_TOKEN")
+    discord_nsfw_channel_ids = parse_allowed_channel_ids(source.get("DISCORD_NSFW_CHANNEL_IDS"))
+    discord_sfw_channel_ids = parse_allowed_channel_ids(source.get("DISCORD_SFW_CHANNEL_IDS"))
+    routes_path = source.get("ROUTES_PATH") or None
+    if routes_path:
+        telegram_nsfw_chat_id = source.get("TELEGRAM_NSFW_CHAT_ID") or None
+        telegram_sfw_chat_id = source.get("TELEGRAM_SFW_CHAT_ID") or None
+        routes = load_routes(routes_path)
+    else:
+        telegram_nsfw_chat_id = require_env(source, "TELEGRAM_NSFW_CHAT_ID")
+        telegram_sfw_chat_id = require_env(source, "TELEGRAM_SFW_CHAT_ID")
+        routes = default_routes(
+            telegram_nsfw_chat_id,
+            telegram_sfw_chat_id,
+            discord_nsfw_channel_ids,
+            discord_sfw_channel_ids,
+        )
+
+    telegram_api_url = source.get("TELEGRAM_API_URL") or TELEGRAM_API_URL
+    telegram_local_mode = parse_bool(source, "TELEGRAM_LOCAL_MODE", TELEGRAM_LOCAL_MODE)
+    if telegram_local_mode and telegram_api_url == TELEGRAM_API_URL:
+        raise ConfigError("TELEGRAM_LOCAL_MODE requires TELEGRAM_API_URL to point to a local Bot API server")
+
     return BotConfig(
-        telegram_bot_token=require_env(source, "TELEGRAM_BOT_TOKEN"),
-        telegram_nsfw_chat_id=require_env(source, "TELEGRAM_NSFW_CHAT_ID"),
-        telegram_sfw_chat_id=require_env(source, "TELEGRAM_SFW_CHAT_ID"),
-        discord_bot_token=require_env(source, "DISCORD_BOT_TOKEN"),
-        discord_nsfw_channel_ids=parse_allowed_channel_ids(source.get("DISCORD_NSFW_CHANNEL_IDS")),
-        discord_sfw_channel_ids=parse_allowed_channel_ids(source.get("DISCORD_SFW_CHANNEL_IDS")),
+        telegram_bot_token=telegram_bot_token,
+        telegram_nsfw_chat_id=telegram_nsfw_chat_id,
+        telegram_sfw_chat_id=telegram_sfw_chat_id,
+        discord_bot_token=discord_bot_token,
+        discord_nsfw_channel_ids=discord_nsfw_channel_ids,
+        discord_sfw_channel_ids=discord_sfw_channel_ids,
+        routes=routes,
+        routes_path=routes_path,
+        repost_queue_path=source.get("REPOST_QUEUE_PATH") or REPOST_QUEUE_PATH,
+        repost_workers=parse_positive_int(source, "REPOST_WORKERS", REPOST_WORKERS),
+        repost_max_attempts=parse_positive_int(source, "REPOST_MAX_ATTEMPTS", REPOST_MAX_ATTEMPTS),
+        repost_coalesce_window_ms=parse_non_negative_int(
+            source,
+            "REPOST_COALESCE_WINDOW_MS",
+            REPOST_COALESCE_WINDOW_MS,
+        ),
+        repost_coalesce_max_messages=parse_positive_int(
+            source,
+            "REPOST_COALESCE_MAX_MESSAGES",
+            REPOST_COALESCE_MAX_MESSAGES,
+        ),
+        attachment_cache_path=source.get("ATTACHMENT_CACHE_PATH") or ATTACHMENT_CACHE_PATH,
+        attachment_cache_max_entries=parse_positive_int(
+            source,
+            "ATTACHMENT_CACHE_MAX_ENTRIES",
+            ATTACHMENT_CACHE_MAX_ENTRIES,
+        ),
+        attachment_cache_ttl_seconds=parse_positive_int(
+            source,
+            "ATTACHMENT_CACHE_TTL_SECONDS",
+            ATTACHMENT_CACHE_TTL_SECONDS,
+        ),
+        download_concurrency_per_message=parse_positive_int(
+            source,
+            "DOWNLOAD_CONCURRENCY_PER_MESSAGE",
+            DOWNLOAD_CONCURRENCY_PER_MESSAGE,
+        ),
+        download_concurrency_global=parse_positive_int(
+            source,
+            "DOWNLOAD_CONCURRENCY_GLOBAL",
+            DOWNLOAD_CONCURRENCY_GLOBAL,
+        ),
+        download_connection_limit=parse_positive_int(
+            source,
+            "DOWNLOAD_CONNECTION_LIMIT",
+            DOWNLOAD_CONNECTION_LIMIT,
+        ),
+        download_connection_limit_per_host=parse_positive_int(
+            source,
+            "DOWNLOAD_CONNECTION_LIMIT_PER_HOST",
+            DOWNLOAD_CONNECTION_LIMIT_PER_HOST,
+        ),
+        download_dns_cache_ttl_seconds=parse_positive_int(
+            source,
+            "DOWNLOAD_DNS_CACHE_TTL_SECONDS",
+            DOWNLOAD_DNS_CACHE_TTL_SECONDS,
+        ),
+        download_keepalive_timeout_seconds=parse_positive_int(
+            source,
+            "DOWNLOAD_KEEPALIVE_TIMEOUT_SECONDS",
+            DOWNLOAD_KEEPALIVE_TIMEOUT_SECONDS,
+        ),
+        download_chunk_size_bytes=parse_positive_int(
+            source,
+            "DOWNLOAD_CHUNK_SIZE_BYTES",
+            DOWNLOAD_CHUNK_SIZE_BYTES,
+        ),
+        temp_janitor_interval_seconds=parse_positive_int(
+            source,
+            "TEMP_JANITOR_INTERVAL_SECONDS",
+            TEMP_JANITOR_INTERVAL_SECONDS,
+        ),
+        temp_max_age_seconds=parse_positive_int(source, "TEMP_MAX_AGE_SECONDS", TEMP_MAX_AGE_SECONDS),
+        temp_quota_bytes=parse_positive_int(source, "TEMP_QUOTA_BYTES", TEMP_QUOTA_BYTES),
+        relay_mode=parse_bool(source, "RELAY_MODE", RELAY_MODE),
+        url_passthrough=parse_bool(source, "URL_PASSTHROUGH", URL_PASSTHROUGH),
+        media_processing=parse_bool(source, "MEDIA_PROCESSING", MEDIA_PROCESSING),
+        media_processing_workers=parse_positive_int(source, "MEDIA_PROCESSING_WORKERS", MEDIA_PROCESSING_WORKERS),
+        media_processing_timeout_seconds=parse_positive_int(
+            source,
+            "MEDIA_PROCESSING_TIMEOUT_SECONDS",
+            MEDIA_PROCESSING_TIMEOUT_SECONDS,
+        ),
+        media_processing_max_input_bytes=parse_positive_int(
+            source,
+            "MEDIA_PROCESSING_MAX_INPUT_BYTES",
+            MEDIA_PROCESSING_MAX_INPUT_BYTES,
+        ),
+        relay_spool_max_bytes=parse_positive_int(source, "RELAY_SPOOL_MAX_BYTES", RELAY_SPOOL_MAX_BYTES),
+        telegram_global_rate_per_second=parse_positive_int(
+            source,
+            "TELEGRAM_GLOBAL_RATE_PER_SECOND",
+            TELEGRAM_GLOBAL_RATE_PER_SECOND,
+        ),
+        telegram_chat_rate_per_minute=parse_positive_int(
+            source,
+            "TELEGRAM_CHAT_RATE_PER_MINUTE",
+            TELEGRAM_CHAT_RATE_PER_MINUTE,
+        ),
+        telegram_chat_burst=parse_positive_int(source, "TELEGRAM_CHAT_BURST", TELEGRAM_CHAT_BURST),
+        telegram_max_retries=parse_positive_int(source, "TELEGRAM_MAX_RETRIES", TELEGRAM_MAX_RETRIES),
+        telegram_connection_pool_size=parse_positive_int(
+            source,
+            "TELEGRAM_CONNECTION_POOL_SIZE",
+            TELEGRAM_CONNECTION_POOL_SIZE,
+        ),
+        telegram_api_url=telegram_api_url,
+        telegram_local_mode=telegram_local_mode,
+        telegram_read_timeout_seconds=parse_positive_int(
+            source,
+            "TELEGRAM_READ_TIMEOUT_SECONDS",
+            TELEGRAM_LOCAL_MODE_READ_TIMEOUT_SECONDS if telegram_local_mode else TELEGRAM_READ_TIMEOUT_SECONDS,
+        ),
+        telegram_upload_pool_size=parse_positive_int(source, "TELEGRAM_UPLOAD_POOL_SIZE", TELEGRAM_UPLOAD_POOL_SIZE),
+        telegram_upload_read_timeout_seconds=parse_positive_int(
+            source,
+            "TELEGRAM_UPLOAD_READ_TIMEOUT_SECONDS",
+            TELEGRAM_UPLOAD_READ_TIMEOUT_SECONDS,
+        ),
+        telegram_upload_write_timeout_seconds=parse_positive_int(
+            source,
+            "TELEGRAM_UPLOAD_WRITE_TIMEOUT_SECONDS",
+            TELEGRAM_UPLOAD_WRITE_TIMEOUT_SECONDS,
+        ),
+        telegram_http2=parse_bool(source, "TELEGRAM_HTTP2", TELEGRAM_HTTP2),
+        telegram_warm_up_connections=parse_non_negative_int(
+            source,
+            "TELEGRAM_WARM_UP_CONNECTIONS",
+            TELEGRAM_WARM_UP_CONNECTIONS,
+        ),
+        loop_lag_warning_ms=parse_positive_int(source, "LOOP_LAG_WARNING_MS", LOOP_LAG_WARNING_MS),
+        backfill_on_startup=parse_bool(source, "BACKFILL_ON_STARTUP", BACKFILL_ON_STARTUP),
+        backfill_max_messages=parse_positive_int(source, "BACKFILL_MAX_MESSAGES", BACKFILL_MAX_MESSAGES),
+        metrics_host=source.get("METRICS_HOST") or METRICS_HOST,
+        metrics_port=parse_non_negative_int(source, "METRICS_PORT", METRICS_PORT),
     )
@@ -1,9 +1,16 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import BinaryIO
 
 
 @dataclass(frozen=True)
 class LocalFile:
-    path: str
+    path: str | None
     filename: str
     content_type: str | None = None
     has_spoiler: bool = False
+    telegram_file_id: str | None = None
+    attachment_id: int | None = None
+    size: int | None = None
+    sha256: str | None = None
+    url: str | None = None
+    buffer: BinaryIO | None = field(default=None, compare=False, repr=False)
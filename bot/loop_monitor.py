@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from .metrics import LOOP_LAG_SECONDS
+
+
+DEFAULT_INTERVAL_SECONDS = 0.5
+DEFAULT_WARNING_THRESHOLD_SECONDS = 0.1
+
+
+@dataclass
+class LoopLagStats:
+    samples: int = 0
+    slow_samples: int = 0
+    total_lag_seconds: float = 0.0
+    max_lag_seconds: float = 0.0
+
+    def record(self, lag: float, slow: bool) -> None:
+        self.samples += 1
+        self.total_lag_seconds += lag
+        self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        if slow:
+            self.slow_samples += 1
+
+
+class LoopLagMonitor:
+    def __init__(
+        self,
+        interval_seconds: float = DEFAULT_INTERVAL_SECONDS,
+        warning_threshold_seconds: float = DEFAULT_WARNING_THRESHOLD_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.interval_seconds = interval_seconds
+        self.warning_threshold_seconds = warning_threshold_seconds
+        self.clock = clock
+        self.stats = LoopLagStats()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self.stats.samples:
+            logging.info(
+                "Event loop lag: max %.3fs, mean %.3fs, %d/%d samples above %.3fs",
+                self.stats.max_lag_seconds,
+                self.stats.total_lag_seconds / self.stats.samples,
+                self.stats.slow_samples,
+                self.stats.samples,
+                self.warning_threshold_seconds,
+            )
+
+    def record(self, lag: float) -> None:
+        slow = lag >= self.warning_threshold_seconds
+        self.stats.record(lag, slow)
+        LOOP_LAG_SECONDS.observe(lag)
+        if slow:
+            logging.warning("Event loop was blocked for %.3fs", lag)
+
+    async def _run(self) -> None:
+        while True:
+            started_at = self.clock()
+            await asyncio.sleep(self.interval_seconds)
+            self.record(max(0.0, self.clock() - started_at - self.interval_seconds))
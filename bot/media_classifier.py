@@ -5,6 +5,10 @@ from enum import Enum
 MB = 1024 * 1024
 TELEGRAM_PHOTO_LIMIT_BYTES = 10 * MB
 TELEGRAM_FILE_LIMIT_BYTES = 50 * MB
+LOCAL_BOT_API_FILE_LIMIT_BYTES = 2000 * MB
+TELEGRAM_URL_PHOTO_LIMIT_BYTES = 5 * MB
+TELEGRAM_URL_FILE_LIMIT_BYTES = 20 * MB
+TELEGRAM_URL_DOCUMENT_EXTENSIONS = {"gif", "pdf", "zip"}
 
 
 class TelegramFileKind(str, Enum):
@@ -15,6 +19,16 @@ class TelegramFileKind(str, Enum):
     SKIP = "skip"
 
 
+@dataclass(frozen=True)
+class MediaLimits:
+    photo_bytes: int = TELEGRAM_PHOTO_LIMIT_BYTES
+    file_bytes: int = TELEGRAM_FILE_LIMIT_BYTES
+
+
+DEFAULT_MEDIA_LIMITS = MediaLimits()
+LOCAL_BOT_API_MEDIA_LIMITS = MediaLimits(file_bytes=LOCAL_BOT_API_FILE_LIMIT_BYTES)
+
+
 @dataclass(frozen=True)
 class ClassifiedFile:
     kind: TelegramFileKind
@@ -25,19 +39,49 @@ def is_spoiler_filename(filename: str) -> bool:
     return filename.startswith("SPOILER_")
 
 
-def classify_file(filename: str, content_type: str | None, file_size: int) -> ClassifiedFile:
+def file_extension(filename: str) -> str:
+    return filename.rsplit(".", maxsplit=1)[-1].lower() if "." in filename else ""
+
+
+def can_send_by_url(filename: str, content_type: str | None, file_size: int, kind: TelegramFileKind) -> bool:
+    extension = file_extension(filename)
+
+    if kind == TelegramFileKind.PHOTO:
+        return file_size <= TELEGRAM_URL_PHOTO_LIMIT_BYTES
+
+    if file_size > TELEGRAM_URL_FILE_LIMIT_BYTES:
+        return False
+
+    if kind == TelegramFileKind.ANIMATION:
+        return extension == "gif"
+
+    if kind == TelegramFileKind.VIDEO:
+        return content_type == "video/mp4"
+
+    if kind == TelegramFileKind.DOCUMENT:
+        return extension in TELEGRAM_URL_DOCUMENT_EXTENSIONS
+
+    return False
+
+
+def classify_file(
+    filename: str,
+    content_type: str | None,
+    file_size: int,
+    limits: MediaLimits = DEFAULT_MEDIA_LIMITS,
+) -> ClassifiedFile:
     normalized_content_type = content_type or ""
-    extension = filename.rsplit(".", maxsplit=1)[-1].lower() if "." in filename else ""
+    extension = file_extension(filename)
 
-    if "image" in normalized_content_type and file_size > TELEGRAM_PHOTO_LIMIT_BYTES:
-        if file_size <= TELEGRAM_FILE_LIMIT_BYTES:
+    if "image" in normalized_content_type and file_size > limits.photo_bytes:
+        if file_size <= limits.file_bytes:
             return ClassifiedFile(TelegramFileKind.DOCUMENT, "image too large for Telegram photo")
         return ClassifiedFile(TelegramFileKind.SKIP, "image too large for Telegram document")
 
-    if "video" in normalized_content_type and file_size > TELEGRAM_FILE_LIMIT_BYTES:
+    if "video" in normalized_content_type and file_size > limits.file_bytes:
         return ClassifiedFile(TelegramFileKind.SKIP, "video too large for Telegram")
 
-    if file_size > TELEGRAM_FILE_LIMIT_BYTES:
+    if file_size > limits.file_bytes:
         return ClassifiedFile(TelegramFileKind.SKIP, "file too large for Telegram")
 
     if extension in {"gif", "webm"}:
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import replace
+from typing import Callable
+
+from .local_file import LocalFile
+from .media_classifier import DEFAULT_MEDIA_LIMITS, MediaLimits, TelegramFileKind, file_extension
+
+
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_TIMEOUT_SECONDS = 120.0
+DEFAULT_MAX_INPUT_BYTES = 500 * 1024 * 1024
+MAX_IMAGE_DIMENSION = 4096
+IMAGE_QUALITIES = (90, 80, 70, 60, 50)
+VIDEO_MAX_WIDTH = 1280
+VIDEO_AUDIO_BITRATE = 128_000
+VIDEO_SIZE_HEADROOM = 0.9
+PROCESSED_SUFFIX = ".processed"
+TRANSCODABLE_EXTENSIONS = {"mp4", "mov", "m4v", "mkv", "avi"}
+
+
+class MediaProcessingError(RuntimeError):
+    pass
+
+
+def shrink_image(input_path: str, output_path: str, max_bytes: int) -> int:
+    from PIL import Image
+
+    with Image.open(input_path) as source:
+        image = source.convert("RGB")
+
+    image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+    while True:
+        for quality in IMAGE_QUALITIES:
+            image.save(output_path, "JPEG", quality=quality, optimize=True)
+            size = os.path.getsize(output_path)
+            if size <= max_bytes:
+                return size
+
+        if min(image.size) <= 256:
+            raise MediaProcessingError(f"could not shrink image below {max_bytes} bytes")
+        image = image.resize((image.width // 2, image.height // 2))
+
+
+def transcode_video(input_path: str, output_path: str, max_bytes: int, timeout_seconds: float) -> int:
+    if shutil.which("ffmpeg") is None:
+        raise MediaProcessingError("ffmpeg is not installed")
+
+    duration = _probe_duration(input_path, timeout_seconds)
+    command = [
+        "ffmpeg",
+        "-nostdin",
+        "-y",
+        "-i",
+        input_path,
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-pix_fmt",
+        "yuv420p",
+        "-vf",
+        f"scale='min({VIDEO_MAX_WIDTH},iw)':-2",
+        "-c:a",
+        "aac",
+        "-b:a",
+        str(VIDEO_AUDIO_BITRATE),
+        "-movflags",
+        "+faststart",
+    ]
+    if duration:
+        video_bitrate = int(max_bytes * 8 * VIDEO_SIZE_HEADROOM / duration) - VIDEO_AUDIO_BITRATE
+        if video_bitrate <= 0:
+            raise MediaProcessingError("video is too long to fit Telegram limits")
+        command += ["-b:v", str(video_bitrate), "-maxrate", str(video_bitrate), "-bufsize", str(video_bitrate * 2)]
+    else:
+        command += ["-crf", "28"]
+    command += ["-f", "mp4", output_path]
+
+    subprocess.run(command, check=True, capture_output=True, timeout=timeout_seconds)
+    size = os.path.getsize(output_path)
+    if size > max_bytes:
+        raise MediaProcessingError(f"transcoded video is still {size} bytes")
+    return size
+
+
+def _probe_duration(input_path: str, timeout_seconds: float) -> float | None:
+    if shutil.which("ffprobe") is None:
+        return None
+
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-show_entries",
+            "format=duration",
+            "-of",
+            "default=noprint_wrappers=1:nokey=1",
+            input_path,
+        ],
+        capture_output=True,
+        text=True,
+        timeout=timeout_seconds,
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+class MediaProcessor:
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        max_input_bytes: int = DEFAULT_MAX_INPUT_BYTES,
+        executor: Executor | None = None,
+        image_shrinker: Callable[[str, str, int], int] = shrink_image,
+        video_transcoder: Callable[[str, str, int, float], int] = transcode_video,
+        limits: MediaLimits = DEFAULT_MEDIA_LIMITS,
+    ):
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self.max_input_bytes = max_input_bytes
+        self.image_shrinker = image_shrinker
+        self.video_transcoder = video_transcoder
+        self.limits = limits
+        self.semaphore = asyncio.Semaphore(max_workers)
+        self._executor = executor
+
+    def needs_processing(self, filename: str, content_type: str | None, size: int) -> bool:
+        return self.output_kind(filename, content_type, size) is not None
+
+    def output_kind(self, filename: str, content_type: str | None, size: int) -> TelegramFileKind | None:
+        if size > self.max_input_bytes:
+            return None
+
+        normalized_content_type = content_type or ""
+        extension = file_extension(filename)
+        if "image" in normalized_content_type and extension not in {"gif", "webm"}:
+            return TelegramFileKind.PHOTO if size > self.limits.photo_bytes else None
+
+        if "video" in normalized_content_type and extension in TRANSCODABLE_EXTENSIONS:
+            if size > self.limits.file_bytes or normalized_content_type != "video/mp4":
+                return TelegramFileKind.VIDEO
+
+        return None
+
+    async def process(self, local_files: list[LocalFile]) -> list[LocalFile]:
+        return list(await asyncio.gather(*(self._process_file(local_file) for local_file in local_files)))
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _process_file(self, local_file: LocalFile) -> LocalFile:
+        if local_file.path is None or local_file.telegram_file_id:
+            return local_file
+
+        kind = self.output_kind(local_file.filename, local_file.content_type, local_file.size or 0)
+        if kind is None:
+            return local_file
+
+        if kind == TelegramFileKind.PHOTO:
+            extension, content_type = "jpg", "image/jpeg"
+            function, args = self.image_shrinker, (self.limits.photo_bytes,)
+        else:
+            extension, content_type = "mp4", "video/mp4"
+            function, args = self.video_transcoder, (self.limits.file_bytes, self.timeout_seconds)
+
+        output_path = f"{local_file.path}{PROCESSED_SUFFIX}.{extension}"
+        async with self.semaphore:
+            logging.info("Processing %s to fit Telegram limits", local_file.filename)
+            loop = asyncio.get_running_loop()
+            try:
+                size = await asyncio.wait_for(
+                    loop.run_in_executor(self._get_executor(), function, local_file.path, output_path, *args),
+                    self.timeout_seconds,
+                )
+            except Exception as error:
+                logging.error("Could not process %s: %s", local_file.filename, error)
+                await asyncio.to_thread(_remove_if_exists, output_path)
+                return local_file
+
+        await asyncio.to_thread(_remove_if_exists, local_file.path)
+        stem = local_file.filename.rsplit(".", maxsplit=1)[0]
+        logging.info(
+            "Processed %s from %d to %d bytes",
+            local_file.filename,
+            local_file.size or 0,
+            size,
+        )
+        return replace(
+            local_file,
+            path=output_path,
+            filename=f"{stem}.{extension}",
+            content_type=content_type,
+            size=size,
+        )
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+
+def _remove_if_exists(file_path: str) -> None:
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
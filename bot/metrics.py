@@ -0,0 +1,229 @@
+import inspect
+import logging
+import math
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator
+
+from aiohttp import web
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+LabelValues = tuple[str, ...]
+
+
+def _format_labels(labelnames: tuple[str, ...], values: LabelValues, extra: dict[str, str] | None = None) -> str:
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    async def render(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self.buckets = (*sorted(buckets), math.inf)
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        counts = self._counts.setdefault(key, [0] * len(self.buckets))
+        for index, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                counts[index] += 1
+        self._sums[key] = self._sums.get(key, 0) + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started_at, **labels)
+
+    def count(self, **labels: str) -> int:
+        counts = self._counts.get(tuple(str(labels[name]) for name in self.labelnames))
+        return counts[-1] if counts else 0
+
+    async def render(self) -> list[str]:
+        lines = []
+        for key, counts in sorted(self._counts.items()):
+            for bucket, count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames, key, {"le": _format_value(bucket)})
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+
+class Gauge:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        function: Callable[[], float | Awaitable[float]],
+        kind: str = "gauge",
+    ):
+        self.name = name
+        self.description = description
+        self.function = function
+        self.kind = kind
+
+    async def render(self) -> list[str]:
+        value = self.function()
+        if inspect.isawaitable(value):
+            value = await value
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+
+    def counter(self, name: str, description: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, description, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, description, labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        description: str,
+        function: Callable[[], float | Awaitable[float]],
+        kind: str = "gauge",
+    ) -> Gauge:
+        return self._register(Gauge(name, description, function, kind))
+
+    async def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = await metric.render()
+            except Exception as error:
+                logging.error("Could not collect metric %s: %s", metric.name, error)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "repost_stage_seconds",
+    "Time spent in each stage of the repost pipeline.",
+    ("stage",),
+)
+FILES_TOTAL = REGISTRY.counter(
+    "repost_files_total",
+    "Files sent to Telegram by kind.",
+    ("kind",),
+)
+SKIPPED_ATTACHMENTS_TOTAL = REGISTRY.counter(
+    "repost_skipped_attachments_total",
+    "Attachments that were not sent because they exceed Telegram limits.",
+)
+DOWNLOADED_BYTES_TOTAL = REGISTRY.counter(
+    "repost_downloaded_bytes_total",
+    "Bytes downloaded from Discord.",
+)
+UPLOADED_BYTES_TOTAL = REGISTRY.counter(
+    "repost_uploaded_bytes_total",
+    "Bytes uploaded to Telegram.",
+)
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke up for scheduled callbacks.",
+)
+JOBS_TOTAL = REGISTRY.counter(
+    "repost_jobs_total",
+    "Repost jobs finished by result.",
+    ("result",),
+)
+
+
+class MetricsServer:
+    def __init__(self, registry: MetricsRegistry, host: str, port: int):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logging.info("Serving metrics on http://%s:%d/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._runner is None:
+            return
+
+        await self._runner.cleanup()
+        self._runner = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=await self.registry.render(), content_type="text/plain", charset="utf-8")
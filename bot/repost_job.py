@@ -0,0 +1,69 @@
+import json
+from dataclasses import asdict, dataclass
+
+
+@dataclass(frozen=True)
+class AttachmentInfo:
+    id: int
+    filename: str
+    url: str
+    size: int
+    content_type: str | None = None
+
+
+@dataclass(frozen=True)
+class RepostJob:
+    channel_id: int
+    message_id: int
+    author_id: int
+    content: str
+    attachments: tuple[AttachmentInfo, ...] = ()
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, payload: str) -> "RepostJob":
+        data = json.loads(payload)
+        attachments = tuple(AttachmentInfo(**attachment) for attachment in data.pop("attachments"))
+        return cls(attachments=attachments, **data)
+
+
+def job_from_message(message) -> RepostJob:
+    return RepostJob(
+        channel_id=message.channel.id,
+        message_id=message.id,
+        author_id=message.author.id,
+        content=message.content or "",
+        attachments=tuple(
+            AttachmentInfo(
+                id=attachment.id,
+                filename=attachment.filename,
+                url=attachment.url,
+                size=attachment.size,
+                content_type=attachment.content_type,
+            )
+            for attachment in message.attachments
+        ),
+    )
+
+
+def coalesce_jobs(jobs: list[RepostJob]) -> RepostJob:
+    first_job = jobs[0]
+    return RepostJob(
+        channel_id=first_job.channel_id,
+        message_id=first_job.message_id,
+        author_id=first_job.author_id,
+        content=first_job.content,
+        attachments=tuple(attachment for job in jobs for attachment in job.attachments),
+    )
+
+
+def can_coalesce(first_job: RepostJob, job: RepostJob) -> bool:
+    return (
+        job.channel_id == first_job.channel_id
+        and job.author_id == first_job.author_id
+        and bool(first_job.attachments)
+        and bool(job.attachments)
+        and not job.content
+    )
@@ -0,0 +1,319 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from .repost_job import RepostJob, can_coalesce, coalesce_jobs
+
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_COALESCE_MAX_MESSAGES = 10
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+FAILED = "failed"
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class QueuedJob:
+    id: int
+    job: RepostJob
+    attempts: int
+    merged_ids: tuple[int, ...] = ()
+    enqueued_at: float | None = None
+
+    @property
+    def ids(self) -> tuple[int, ...]:
+        return (self.id, *self.merged_ids)
+
+
+class RepostQueue:
+    def __init__(
+        self,
+        path: str,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        coalesce_window_seconds: float = 0.0,
+        coalesce_max_messages: int = DEFAULT_COALESCE_MAX_MESSAGES,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.coalesce_window_seconds = coalesce_window_seconds
+        self.coalesce_max_messages = coalesce_max_messages
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="repost-queue")
+        self._connection: sqlite3.Connection | None = None
+        self._available = asyncio.Event()
+        self._paused_channel_ids: set[int] = set()
+
+    async def open(self) -> None:
+        await self._run(self._open)
+        recovered = await self._run(self._recover)
+        if recovered:
+            logging.warning("Recovered %d unacknowledged repost jobs", recovered)
+        self._available.set()
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+    async def enqueue(self, job: RepostJob) -> None:
+        inserted = await self._run(self._enqueue, job)
+        if inserted:
+            self._notify()
+        else:
+            logging.info("Repost job for message %d is already queued", job.message_id)
+
+    async def enqueue_many(self, jobs: list[RepostJob]) -> int:
+        inserted = await self._run(self._enqueue_many, jobs)
+        if inserted:
+            self._notify()
+        return inserted
+
+    def pause_channels(self, channel_ids) -> None:
+        self._paused_channel_ids.update(channel_ids)
+
+    def resume_channels(self, channel_ids) -> None:
+        self._paused_channel_ids.difference_update(channel_ids)
+        self._available.set()
+
+    async def checkpoints(self) -> dict[int, int]:
+        return await self._run(self._checkpoints)
+
+    async def claim(self) -> QueuedJob | None:
+        return await self._run(self._claim, tuple(self._paused_channel_ids))
+
+    async def wait_for_jobs(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._available.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._available.clear()
+
+    async def ack(self, queued_job: QueuedJob) -> None:
+        await self._run(self._ack, queued_job.ids)
+        self._available.set()
+
+    async def release(self, queued_job: QueuedJob) -> None:
+        failed = await self._run(self._release, queued_job.ids, queued_job.attempts)
+        if failed:
+            logging.error(
+                "Giving up on repost job for message %d after %d attempts",
+                queued_job.job.message_id,
+                queued_job.attempts,
+            )
+        else:
+            self._available.set()
+
+    async def depth(self) -> int:
+        return await self._run(self._depth)
+
+    def _notify(self) -> None:
+        self._available.set()
+        if self.coalesce_window_seconds:
+            asyncio.get_running_loop().call_later(self.coalesce_window_seconds, self._available.set)
+
+    async def _run(self, function: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS repost_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                UNIQUE (channel_id, message_id)
+            )
+            """
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS repost_jobs_status ON repost_jobs (status, id)")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS repost_jobs_status_message ON repost_jobs (status, message_id)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS repost_jobs_channel_status ON repost_jobs (channel_id, status)"
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS channel_checkpoints (
+                channel_id INTEGER PRIMARY KEY,
+                message_id INTEGER NOT NULL
+            )
+            """
+        )
+        self._connection = connection
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _recover(self) -> int:
+        cursor = self._connection.execute(
+            "UPDATE repost_jobs SET status = ? WHERE status = ?",
+            (PENDING, IN_PROGRESS),
+        )
+        return cursor.rowcount
+
+    def _enqueue(self, job: RepostJob) -> bool:
+        cursor = self._connection.execute(
+            """
+            INSERT OR IGNORE INTO repost_jobs (channel_id, message_id, payload, created_at)
+            VALUES (?, ?, ?, ?)
+            """,
+            (job.channel_id, job.message_id, job.to_json(), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def _enqueue_many(self, jobs: list[RepostJob]) -> int:
+        now = time.time()
+        return self._transaction(
+            lambda: self._connection.executemany(
+                """
+                INSERT OR IGNORE INTO repost_jobs (channel_id, message_id, payload, created_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                [(job.channel_id, job.message_id, job.to_json(), now) for job in jobs],
+            ).rowcount
+        )
+
+    def _transaction(self, function: Callable[[], T]) -> T:
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = function()
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+        return result
+
+    def _claim(self, paused_channel_ids: tuple[int, ...]) -> QueuedJob | None:
+        return self._transaction(lambda: self._claim_in_transaction(paused_channel_ids))
+
+    def _claim_in_transaction(self, paused_channel_ids: tuple[int, ...]) -> QueuedJob | None:
+        row = self._connection.execute(
+            """
+            UPDATE repost_jobs SET status = ?, attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM repost_jobs AS job
+                WHERE status = ? AND created_at <= ?
+                AND channel_id NOT IN (SELECT value FROM json_each(?))
+                AND NOT EXISTS (
+                    SELECT 1 FROM repost_jobs AS busy
+                    WHERE busy.channel_id = job.channel_id AND busy.status = ?
+                )
+                ORDER BY message_id
+                LIMIT 1
+            )
+            RETURNING id, payload, attempts, created_at
+            """,
+            (
+                IN_PROGRESS,
+                PENDING,
+                time.time() - self.coalesce_window_seconds,
+                json.dumps(paused_channel_ids),
+                IN_PROGRESS,
+            ),
+        ).fetchone()
+        if row is None:
+            return None
+
+        job_id, payload, attempts, created_at = row
+        job = RepostJob.from_json(payload)
+        if not self.coalesce_window_seconds or not job.attachments:
+            return QueuedJob(id=job_id, job=job, attempts=attempts, enqueued_at=created_at)
+
+        merged_ids, merged_jobs = self._claim_followers(job, created_at)
+        if merged_ids:
+            logging.info("Coalescing %d messages into message %d", len(merged_ids) + 1, job.message_id)
+        return QueuedJob(
+            id=job_id,
+            job=coalesce_jobs([job, *merged_jobs]),
+            attempts=attempts,
+            merged_ids=tuple(merged_ids),
+            enqueued_at=created_at,
+        )
+
+    def _claim_followers(self, job: RepostJob, created_at: float) -> tuple[list[int], list[RepostJob]]:
+        rows = self._connection.execute(
+            """
+            SELECT id, payload FROM repost_jobs
+            WHERE channel_id = ? AND status = ? AND message_id > ? AND created_at <= ?
+            ORDER BY message_id
+            LIMIT ?
+            """,
+            (
+                job.channel_id,
+                PENDING,
+                job.message_id,
+                created_at + self.coalesce_window_seconds,
+                self.coalesce_max_messages - 1,
+            ),
+        ).fetchall()
+
+        merged_ids = []
+        merged_jobs = []
+        for follower_id, payload in rows:
+            follower = RepostJob.from_json(payload)
+            if not can_coalesce(job, follower):
+                break
+            merged_ids.append(follower_id)
+            merged_jobs.append(follower)
+
+        self._connection.executemany(
+            "UPDATE repost_jobs SET status = ?, attempts = attempts + 1 WHERE id = ?",
+            [(IN_PROGRESS, follower_id) for follower_id in merged_ids],
+        )
+        return merged_ids, merged_jobs
+
+    def _ack(self, job_ids: tuple[int, ...]) -> None:
+        self._transaction(lambda: self._ack_in_transaction(job_ids))
+
+    def _ack_in_transaction(self, job_ids: tuple[int, ...]) -> None:
+        self._connection.execute(
+            """
+            INSERT INTO channel_checkpoints (channel_id, message_id)
+            SELECT channel_id, MAX(message_id) FROM repost_jobs
+            WHERE id IN (SELECT value FROM json_each(?))
+            GROUP BY channel_id
+            ON CONFLICT (channel_id) DO UPDATE SET message_id = MAX(message_id, excluded.message_id)
+            """,
+            (json.dumps(job_ids),),
+        )
+        self._connection.executemany("DELETE FROM repost_jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
+
+    def _checkpoints(self) -> dict[int, int]:
+        return dict(self._connection.execute("SELECT channel_id, message_id FROM channel_checkpoints").fetchall())
+
+    def _release(self, job_ids: tuple[int, ...], attempts: int) -> bool:
+        status = FAILED if attempts >= self.max_attempts else PENDING
+        self._connection.executemany(
+            "UPDATE repost_jobs SET status = ? WHERE id = ?",
+            [(status, job_id) for job_id in job_ids],
+        )
+        return status == FAILED
+
+    def _depth(self) -> int:
+        row = self._connection.execute(
+            "SELECT COUNT(*) FROM repost_jobs WHERE status IN (?, ?)",
+            (PENDING, IN_PROGRESS),
+        ).fetchone()
+        return row[0]
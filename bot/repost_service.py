@@ -1,89 +1,348 @@
+import asyncio
 import logging
 import os
+import threading
+from dataclasses import replace
+from pathlib import Path
+from typing import Awaitable, Callable, Sequence
 
 import discord
-from telegram import InputMediaAnimation, InputMediaPhoto, InputMediaVideo
+from telegram import InputMediaAnimation, InputMediaDocument, InputMediaPhoto, InputMediaVideo
 
-from .attachment_downloader import download_attachments_to_temp_dir, remove_downloaded_files
+from .attachment_cache import AttachmentCache, CachedFile
+from .attachment_downloader import AttachmentDownloader, remove_downloaded_files
 from .local_file import LocalFile
-from .media_classifier import TelegramFileKind, classify_file
+from .media_processor import MediaProcessor
+from .metrics import FILES_TOTAL, SKIPPED_ATTACHMENTS_TOTAL, STAGE_SECONDS, UPLOADED_BYTES_TOTAL
+from .media_classifier import (
+    DEFAULT_MEDIA_LIMITS,
+    ClassifiedFile,
+    MediaLimits,
+    TelegramFileKind,
+    can_send_by_url,
+    classify_file,
+    is_spoiler_filename,
+)
+from .repost_job import RepostJob, job_from_message
+from .routing import RoutingTable
 from .telegram_sender import TelegramSender
 
 
 class RepostService:
     def __init__(
         self,
-        nsfw_sender: TelegramSender,
-        sfw_sender: TelegramSender,
-        nsfw_channel_ids: set[int],
-        sfw_channel_ids: set[int],
+        routing: RoutingTable,
         temp_dir: str,
+        downloader: AttachmentDownloader | None = None,
+        cache: AttachmentCache | None = None,
+        url_passthrough: bool = True,
+        processor: MediaProcessor | None = None,
+        limits: MediaLimits = DEFAULT_MEDIA_LIMITS,
+        local_mode: bool = False,
     ):
-        self.nsfw_sender = nsfw_sender
-        self.sfw_sender = sfw_sender
-        self.nsfw_channel_ids = nsfw_channel_ids
-        self.sfw_channel_ids = sfw_channel_ids
+        self.routing = routing
         self.temp_dir = temp_dir
+        self.downloader = downloader or AttachmentDownloader(temp_dir)
+        self.cache = cache
+        self.url_passthrough = url_passthrough
+        self.processor = processor
+        self.limits = limits
+        self.local_mode = local_mode
+        self._buffer_lock = threading.Lock()
 
-    async def handle_message(self, message: discord.Message) -> None:
+    def accepts(self, message: discord.Message) -> bool:
         if message.author.bot:
-            return
+            return False
 
-        target_senders = self._target_senders_for_channel(message.channel.id)
-        if not target_senders:
-            return
+        if not self.routing.senders_for_channel(message.channel.id):
+            return False
 
         if message.type == discord.MessageType.thread_starter_message:
             logging.info("Ignoring thread creation message")
+            return False
+
+        return True
+
+    async def handle_message(self, message: discord.Message) -> None:
+        if self.accepts(message):
+            await self.deliver(job_from_message(message))
+
+    async def deliver(self, job: RepostJob) -> None:
+        target_senders = self.routing.senders_for_channel(job.channel_id)
+        if not target_senders:
+            return
+
+        content = job.content
+        if not job.attachments:
+            await self._deliver_to_targets(target_senders, lambda sender: sender.send_text(content))
             return
 
-        content = message.content or ""
-        if not message.attachments:
-            for sender in target_senders:
-                await sender.send_text(content)
+        attachments, skipped_attachments = self._partition_attachments(job.attachments)
+        if not attachments:
+            text = self._text_with_skipped_attachment_links(content, skipped_attachments)
+            await self._deliver_to_targets(target_senders, lambda sender: sender.send_text(text))
             return
 
-        local_files = await download_attachments_to_temp_dir(message.attachments, self.temp_dir)
-        if not local_files and message.attachments:
-            for sender in target_senders:
-                await sender.send_attachment_urls(message.attachments, content)
+        local_files = await self._resolve_files(attachments)
+        if not local_files:
+            await self._deliver_to_targets(
+                target_senders,
+                lambda sender: sender.send_attachment_urls(attachments, content),
+            )
             return
 
         try:
-            for sender in target_senders:
-                media, documents, file_objects = self._prepare_files(local_files, content)
-                await sender.send_media_and_documents(media, documents, content, file_objects)
+            primary_sender, *other_senders = target_senders
+            primary_results = await self._deliver_to_targets(
+                [primary_sender],
+                lambda sender: self._send_files_with_fallback(sender, attachments, local_files, content),
+            )
+            outgoing_files = primary_results[0] if isinstance(primary_results[0], list) else local_files
+            await self._cache_file_ids(outgoing_files)
+            if other_senders:
+                await self._deliver_to_targets(
+                    other_senders,
+                    lambda sender: self._send_files(sender, outgoing_files, content),
+                )
         finally:
             await remove_downloaded_files(local_files, self.temp_dir)
 
-    def _target_senders_for_channel(self, channel_id: int) -> list[TelegramSender]:
-        target_senders = []
+    async def _resolve_files(self, attachments: list) -> list[LocalFile]:
+        cached_files = {}
+        if self.cache is not None:
+            cached_by_attachment = await self.cache.lookup_attachments([attachment.id for attachment in attachments])
+            for attachment in attachments:
+                cached_file = cached_by_attachment.get(attachment.id)
+                kind = self._expected_kind(attachment)
+                if cached_file is not None and cached_file.kind == kind:
+                    logging.info("Attachment cache hit, skipping download: %s", attachment.filename)
+                    cached_files[attachment.id] = self._remote_file(
+                        attachment,
+                        telegram_file_id=cached_file.telegram_file_id,
+                        sha256=cached_file.sha256,
+                    )
 
-        if channel_id in self.nsfw_channel_ids:
-            target_senders.append(self.nsfw_sender)
+        url_files = {}
+        if self.url_passthrough:
+            for attachment in attachments:
+                if attachment.id in cached_files:
+                    continue
 
-        if channel_id in self.sfw_channel_ids:
-            target_senders.extend([self.nsfw_sender, self.sfw_sender])
+                kind = self._classify_attachment(attachment).kind
+                if can_send_by_url(attachment.filename, attachment.content_type, attachment.size, kind):
+                    logging.info("Letting Telegram fetch attachment by URL: %s", attachment.filename)
+                    url_files[attachment.id] = self._remote_file(attachment, url=attachment.url)
 
-        return self._unique_senders(target_senders)
+        missing_attachments = [
+            attachment
+            for attachment in attachments
+            if attachment.id not in cached_files and attachment.id not in url_files
+        ]
+        downloaded_files = []
+        if missing_attachments:
+            downloaded_files = await self._download(missing_attachments)
+            downloaded_files = await self._apply_cached_file_ids(downloaded_files)
 
-    def _unique_senders(self, senders: list[TelegramSender]) -> list[TelegramSender]:
-        unique_senders = []
-        seen_ids = set()
+        files_by_attachment = {local_file.attachment_id: local_file for local_file in downloaded_files}
+        files_by_attachment.update(cached_files)
+        files_by_attachment.update(url_files)
+        return [
+            files_by_attachment[attachment.id]
+            for attachment in attachments
+            if attachment.id in files_by_attachment
+        ]
 
-        for sender in senders:
-            sender_id = id(sender)
-            if sender_id in seen_ids:
-                continue
+    async def _download(self, attachments: list) -> list[LocalFile]:
+        with STAGE_SECONDS.time(stage="download"):
+            downloaded_files = await self.downloader.download_to_temp_dir(attachments)
+        if self.processor is not None:
+            with STAGE_SECONDS.time(stage="process"):
+                downloaded_files = await self.processor.process(downloaded_files)
+        return downloaded_files
+
+    def _expected_kind(self, attachment) -> TelegramFileKind:
+        if self.processor is not None:
+            kind = self.processor.output_kind(attachment.filename, attachment.content_type, attachment.size)
+            if kind is not None:
+                return kind
+        return self._classify_attachment(attachment).kind
+
+    def _remote_file(self, attachment, **kwargs) -> LocalFile:
+        return LocalFile(
+            path=None,
+            filename=attachment.filename,
+            content_type=attachment.content_type,
+            has_spoiler=is_spoiler_filename(attachment.filename),
+            attachment_id=attachment.id,
+            size=attachment.size,
+            **kwargs,
+        )
+
+    async def _apply_cached_file_ids(self, local_files: list[LocalFile]) -> list[LocalFile]:
+        hashed_files = [local_file for local_file in local_files if local_file.sha256]
+        if self.cache is None or not hashed_files:
+            return local_files
+
+        await self.cache.remember_attachments(
+            {local_file.attachment_id: local_file.sha256 for local_file in hashed_files}
+        )
+        cached_by_hash = await self.cache.lookup_hashes([local_file.sha256 for local_file in hashed_files])
+        resolved_files = []
+        for local_file in local_files:
+            cached_file = cached_by_hash.get(local_file.sha256)
+            if cached_file is not None and cached_file.kind == self._classify(local_file).kind:
+                logging.info("Attachment cache hit by content, skipping upload: %s", local_file.filename)
+                local_file = replace(local_file, telegram_file_id=cached_file.telegram_file_id)
+            resolved_files.append(local_file)
+        return resolved_files
+
+    async def _cache_file_ids(self, local_files: list[LocalFile]) -> None:
+        if self.cache is None:
+            return
+
+        cached_files = [
+            CachedFile(local_file.sha256, self._classify(local_file).kind, local_file.telegram_file_id)
+            for local_file in local_files
+            if local_file.sha256 and local_file.telegram_file_id
+        ]
+        if cached_files:
+            await self.cache.store(cached_files)
+
+    async def _send_files_with_fallback(
+        self,
+        sender: TelegramSender,
+        attachments: list,
+        local_files: list[LocalFile],
+        content: str,
+    ) -> list[LocalFile]:
+        sent_files = await self._send_files(sender, local_files, content)
+
+        stale_hashes = [
+            local_file.sha256
+            for local_file, sent_file in zip(local_files, sent_files)
+            if local_file.telegram_file_id and not sent_file.telegram_file_id and local_file.sha256
+        ]
+        if stale_hashes and self.cache is not None:
+            logging.warning("Telegram rejected %d cached file_ids, forgetting them", len(stale_hashes))
+            await self.cache.forget(stale_hashes)
+
+        unsent_ids = {
+            sent_file.attachment_id
+            for sent_file in sent_files
+            if sent_file.path is None and sent_file.buffer is None and not sent_file.telegram_file_id
+        }
+        if not unsent_ids:
+            return sent_files
+
+        logging.warning("Downloading %d attachments that could not be sent remotely", len(unsent_ids))
+        retry_attachments = [attachment for attachment in attachments if attachment.id in unsent_ids]
+        retry_files = await self._download(retry_attachments)
+        try:
+            nothing_sent = not any(sent_file.telegram_file_id for sent_file in sent_files)
+            retried_files = await self._send_files(sender, retry_files, content if nothing_sent else "")
+        finally:
+            await remove_downloaded_files(retry_files, self.temp_dir)
+
+        retried_by_attachment = {
+            retried_file.attachment_id: replace(retried_file, path=None, buffer=None)
+            for retried_file in retried_files
+        }
+        return [retried_by_attachment.get(sent_file.attachment_id, sent_file) for sent_file in sent_files]
+
+    async def _deliver_to_targets(
+        self,
+        senders: Sequence[TelegramSender],
+        deliver: Callable[[TelegramSender], Awaitable],
+    ) -> list:
+        results = await asyncio.gather(*(deliver(sender) for sender in senders), return_exceptions=True)
+        for sender, result in zip(senders, results):
+            if isinstance(result, Exception):
+                logging.error("Delivery to Telegram chat %s failed: %s", sender.chat_id, result)
+                logging.error("Exception details:", exc_info=result)
+        return results
+
+    async def _send_files(
+        self,
+        sender: TelegramSender,
+        local_files: list[LocalFile],
+        content: str,
+    ) -> list[LocalFile]:
+        with STAGE_SECONDS.time(stage="classify"):
+            media, documents, file_objects, prepared_files = await asyncio.to_thread(
+                self._prepare_files,
+                local_files,
+                content,
+            )
+        with STAGE_SECONDS.time(stage="upload"):
+            file_ids = await sender.send_media_and_documents(media, documents, content, file_objects)
+        self._count_sent_files(prepared_files)
+        return self._with_telegram_file_ids(local_files, prepared_files, file_ids)
+
+    def _count_sent_files(self, prepared_files: list[LocalFile]) -> None:
+        for local_file in prepared_files:
+            FILES_TOTAL.inc(kind=self._classify(local_file).kind.value)
+            if not local_file.telegram_file_id and not local_file.url:
+                UPLOADED_BYTES_TOTAL.inc(local_file.size or 0)
+
+    def _partition_attachments(self, attachments) -> tuple[list, list]:
+        downloadable = []
+        skipped = []
+
+        for attachment in attachments:
+            classification = self._classify_attachment(attachment)
+            if classification.kind == TelegramFileKind.SKIP and self._expected_kind(attachment) != classification.kind:
+                logging.info(
+                    "%s, downloading for processing: %s (%d bytes)",
+                    classification.reason,
+                    attachment.filename,
+                    attachment.size,
+                )
+                downloadable.append(attachment)
+            elif classification.kind == TelegramFileKind.SKIP:
+                logging.error(
+                    "%s, skipping download: %s (%d bytes)",
+                    classification.reason,
+                    attachment.filename,
+                    attachment.size,
+                )
+                SKIPPED_ATTACHMENTS_TOTAL.inc()
+                skipped.append(attachment)
+            else:
+                downloadable.append(attachment)
+
+        return downloadable, skipped
+
+    def _text_with_skipped_attachment_links(self, content: str, skipped_attachments: list) -> str:
+        parts = [content, *(attachment.url for attachment in skipped_attachments)]
+        return "\n".join(part for part in parts if part)
 
-            seen_ids.add(sender_id)
-            unique_senders.append(sender)
+    def _with_telegram_file_ids(
+        self,
+        local_files: list[LocalFile],
+        sent_files: list[LocalFile],
+        file_ids: list[str | None],
+    ) -> list[LocalFile]:
+        file_ids_by_file = {id(sent_file): file_id for sent_file, file_id in zip(sent_files, file_ids)}
+        return [
+            replace(local_file, telegram_file_id=file_ids_by_file[id(local_file)])
+            if id(local_file) in file_ids_by_file
+            else local_file
+            for local_file in local_files
+        ]
+
+    def _classify(self, local_file: LocalFile) -> ClassifiedFile:
+        return classify_file(local_file.filename, local_file.content_type, local_file.size or 0, self.limits)
 
-        return unique_senders
+    def _classify_attachment(self, attachment) -> ClassifiedFile:
+        return classify_file(attachment.filename, attachment.content_type, attachment.size, self.limits)
 
-    def _prepare_files(self, local_files: list[LocalFile], content: str) -> tuple[list, list[tuple], list]:
-        media = []
-        documents = []
+    def _prepare_files(
+        self,
+        local_files: list[LocalFile],
+        content: str,
+    ) -> tuple[list, list[InputMediaDocument], list, list[LocalFile]]:
+        media_entries = []
+        document_entries = []
         file_objects = []
 
         for index, local_file in enumerate(local_files):
@@ -95,53 +354,87 @@ class RepostService:
                 local_file.has_spoiler,
             )
 
-            if not os.path.exists(local_file.path):
-                logging.error("File not found: %s", local_file.path)
+            if local_file.telegram_file_id or local_file.buffer is not None or local_file.url:
+                classification = self._classify(local_file)
+            elif local_file.path and os.path.exists(local_file.path):
+                file_size = os.path.getsize(local_file.path)
+                logging.info("File size: %d bytes", file_size)
+                classification = classify_file(local_file.filename, local_file.content_type, file_size, self.limits)
+            else:
+                logging.error("File not found: %s", local_file.path or local_file.filename)
                 continue
 
-            file_size = os.path.getsize(local_file.path)
-            logging.info("File size: %d bytes", file_size)
-            classification = classify_file(local_file.filename, local_file.content_type, file_size)
-
             if classification.kind == TelegramFileKind.SKIP:
                 logging.error("%s: %s", classification.reason, local_file.filename)
                 continue
 
-            file_object = open(local_file.path, "rb")
-            file_objects.append(file_object)
-            caption = content if index == 0 else None
-
-            if classification.kind == TelegramFileKind.ANIMATION:
-                logging.info("Adding as animation: %s", local_file.filename)
-                media.append(
-                    InputMediaAnimation(
-                        media=file_object,
-                        caption=caption,
-                        has_spoiler=local_file.has_spoiler,
-                    )
-                )
-            elif classification.kind == TelegramFileKind.PHOTO:
-                logging.info("Adding as photo: %s", local_file.filename)
-                media.append(
-                    InputMediaPhoto(
-                        media=file_object,
-                        caption=caption,
-                        has_spoiler=local_file.has_spoiler,
-                    )
-                )
-            elif classification.kind == TelegramFileKind.VIDEO:
-                logging.info("Adding as video: %s", local_file.filename)
-                media.append(
-                    InputMediaVideo(
-                        media=file_object,
-                        caption=caption,
-                        has_spoiler=local_file.has_spoiler,
-                    )
-                )
+            if local_file.telegram_file_id:
+                logging.info("Reusing Telegram file_id for: %s", local_file.filename)
+                file_object = local_file.telegram_file_id
+            elif local_file.buffer is not None:
+                with self._buffer_lock:
+                    local_file.buffer.seek(0)
+                    file_object = local_file.buffer.read()
+            elif local_file.url:
+                logging.info("Sending by URL: %s", local_file.filename)
+                file_object = local_file.url
+            elif self.local_mode:
+                logging.info("Letting the local Bot API server read the file from disk: %s", local_file.filename)
+                file_object = Path(local_file.path).absolute()
             else:
+                file_object = open(local_file.path, "rb")
+                file_objects.append(file_object)
+
+            if classification.kind == TelegramFileKind.DOCUMENT:
                 if classification.reason:
                     logging.warning("%s: %s", classification.reason, local_file.filename)
-                logging.info("Adding as document: %s", local_file.filename)
-                documents.append((file_object, local_file.filename))
+                document_entries.append((local_file, classification.kind, file_object))
+            else:
+                media_entries.append((local_file, classification.kind, file_object))
+
+        caption_entry = (media_entries or document_entries or [None])[0]
+        media = [
+            self._input_media(*entry, caption=content if entry is caption_entry else None)
+            for entry in media_entries
+        ]
+        documents = [
+            self._input_media(*entry, caption=content if entry is caption_entry else None)
+            for entry in document_entries
+        ]
+        prepared_files = [entry[0] for entry in media_entries + document_entries]
+        return media, documents, file_objects, prepared_files
+
+    def _input_media(self, local_file: LocalFile, kind: TelegramFileKind, file_object, caption: str | None):
+        if kind == TelegramFileKind.ANIMATION:
+            logging.info("Adding as animation: %s", local_file.filename)
+            return InputMediaAnimation(
+                media=file_object,
+                caption=caption,
+                filename=local_file.filename,
+                has_spoiler=local_file.has_spoiler,
+            )
+
+        if kind == TelegramFileKind.PHOTO:
+            logging.info("Adding as photo: %s", local_file.filename)
+            return InputMediaPhoto(
+                media=file_object,
+                caption=caption,
+                filename=local_file.filename,
+                has_spoiler=local_file.has_spoiler,
+            )
+
+        if kind == TelegramFileKind.VIDEO:
+            logging.info("Adding as video: %s", local_file.filename)
+            return InputMediaVideo(
+                media=file_object,
+                caption=caption,
+                filename=local_file.filename,
+                has_spoiler=local_file.has_spoiler,
+            )
 
-        return media, documents, file_objects
+        logging.info("Adding as document: %s", local_file.filename)
+        return InputMediaDocument(
+            media=file_object,
+            caption=caption,
+            filename=local_file.filename,
+        )
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+
+from .metrics import JOBS_TOTAL, STAGE_SECONDS
+from .repost_queue import QueuedJob, RepostQueue
+from .repost_service import RepostService
+
+
+DEFAULT_WORKER_COUNT = 4
+POLL_INTERVAL_SECONDS = 5.0
+
+
+class RepostWorkerPool:
+    def __init__(
+        self,
+        queue: RepostQueue,
+        repost_service: RepostService,
+        worker_count: int = DEFAULT_WORKER_COUNT,
+    ):
+        self.queue = queue
+        self.repost_service = repost_service
+        self.worker_count = worker_count
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        logging.info("Starting %d repost workers", self.worker_count)
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"repost-worker-{index}")
+            for index in range(self.worker_count)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self) -> None:
+        while True:
+            queued_job = await self.queue.claim()
+            if queued_job is None:
+                await self.queue.wait_for_jobs(POLL_INTERVAL_SECONDS)
+                continue
+
+            await self._process(queued_job)
+
+    async def _process(self, queued_job: QueuedJob) -> None:
+        if queued_job.enqueued_at is not None:
+            STAGE_SECONDS.observe(max(0.0, time.time() - queued_job.enqueued_at), stage="queue")
+
+        try:
+            await self.repost_service.deliver(queued_job.job)
+        except Exception as error:
+            JOBS_TOTAL.inc(result="failed")
+            logging.error(
+                "Repost job for message %d failed (attempt %d): %s",
+                queued_job.job.message_id,
+                queued_job.attempts,
+                error,
+            )
+            logging.error("Exception details:", exc_info=True)
+            await self.queue.release(queued_job)
+            return
+
+        with STAGE_SECONDS.time(stage="ack"):
+            await self.queue.ack(queued_job)
+        JOBS_TOTAL.inc(result="delivered")
+        if queued_job.enqueued_at is not None:
+            STAGE_SECONDS.observe(max(0.0, time.time() - queued_job.enqueued_at), stage="total")
@@ -0,0 +1,40 @@
+import logging
+from typing import Callable
+
+from .config import Routes, TelegramTarget
+from .telegram_sender import TelegramSender
+
+
+class RoutingTable:
+    def __init__(self, routes: Routes, create_sender: Callable[[TelegramTarget], TelegramSender]):
+        self.create_sender = create_sender
+        self._senders: dict[TelegramTarget, TelegramSender] = {}
+        self._table: dict[int, tuple[TelegramSender, ...]] = {}
+        self.load(routes)
+
+    @property
+    def channel_ids(self) -> set[int]:
+        return set(self._table)
+
+    def senders_for_channel(self, channel_id: int) -> tuple[TelegramSender, ...]:
+        return self._table.get(channel_id, ())
+
+    def load(self, routes: Routes) -> None:
+        table = {
+            channel_id: tuple(self._sender_for(target) for target in dict.fromkeys(targets))
+            for channel_id, targets in routes.items()
+            if targets
+        }
+        self._table = table
+        logging.info(
+            "Loaded routes for %d Discord channels to %d Telegram targets",
+            len(table),
+            len({target for targets in routes.values() for target in targets}),
+        )
+
+    def _sender_for(self, target: TelegramTarget) -> TelegramSender:
+        sender = self._senders.get(target)
+        if sender is None:
+            sender = self.create_sender(target)
+            self._senders[target] = sender
+        return sender
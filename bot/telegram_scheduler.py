@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+
+DEFAULT_GLOBAL_RATE_PER_SECOND = 30
+DEFAULT_CHAT_RATE_PER_MINUTE = 20
+DEFAULT_CHAT_BURST = 5
+DEFAULT_MAX_RETRIES = 3
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def reserve(self, cost: float = 1) -> float:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+        self.tokens -= cost
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate_per_second
+
+
+@dataclass
+class SchedulerStats:
+    sends: int = 0
+    retries: int = 0
+    retry_after_responses: int = 0
+    failures: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    def record_wait(self, wait_seconds: float) -> None:
+        self.total_wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+
+class TelegramScheduler:
+    def __init__(
+        self,
+        global_rate_per_second: float = DEFAULT_GLOBAL_RATE_PER_SECOND,
+        chat_rate_per_minute: float = DEFAULT_CHAT_RATE_PER_MINUTE,
+        chat_burst: int = DEFAULT_CHAT_BURST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+    ):
+        self.chat_rate_per_minute = chat_rate_per_minute
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        self.global_bucket = TokenBucket(global_rate_per_second, global_rate_per_second, clock)
+        self.chat_buckets: dict[str, TokenBucket] = {}
+        self.paused_until: dict[str, float] = {}
+        self.stats = SchedulerStats()
+
+    async def run(self, chat_id: str, operation: Callable[[], Awaitable[T]], cost: int = 1) -> T:
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, cost)
+            try:
+                result = await operation()
+                self.stats.sends += 1
+                return result
+            except RetryAfter as error:
+                self.stats.retry_after_responses += 1
+                logging.warning(
+                    "Telegram flood control for chat %s, retrying in %s seconds",
+                    chat_id,
+                    error.retry_after,
+                )
+                self.paused_until[chat_id] = self.clock() + error.retry_after
+                if attempt >= self.max_retries:
+                    self.stats.failures += 1
+                    raise
+            except BadRequest:
+                self.stats.failures += 1
+                raise
+            except NetworkError as error:
+                if attempt >= self.max_retries:
+                    self.stats.failures += 1
+                    raise
+                backoff = self._backoff_seconds(attempt)
+                logging.warning(
+                    "Telegram request for chat %s failed: %s, retrying in %.1f seconds",
+                    chat_id,
+                    error,
+                    backoff,
+                )
+                await self.sleep(backoff)
+
+            attempt += 1
+            self.stats.retries += 1
+
+    async def _acquire(self, chat_id: str, cost: int) -> None:
+        wait_seconds = max(0.0, self.paused_until.get(chat_id, 0.0) - self.clock())
+        wait_seconds = max(
+            wait_seconds,
+            self._chat_bucket(chat_id).reserve(cost),
+            self.global_bucket.reserve(cost),
+        )
+        self.stats.record_wait(wait_seconds)
+        if wait_seconds > 0:
+            logging.debug("Waiting %.2f seconds before sending to Telegram chat %s", wait_seconds, chat_id)
+            await self.sleep(wait_seconds)
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate_per_minute / 60, self.chat_burst, self.clock)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _backoff_seconds(self, attempt: int) -> float:
+        backoff = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2**attempt)
+        return random.uniform(backoff / 2, backoff)
@@ -1,25 +1,43 @@
+import asyncio
 import logging
+from functools import partial
+from typing import Any, Awaitable, Callable
 
-from telegram import Bot, InputMediaAnimation, InputMediaPhoto, InputMediaVideo
+from telegram import Bot, InputMediaAnimation, InputMediaDocument, InputMediaPhoto, InputMediaVideo, Message
+
+from .telegram_scheduler import TelegramScheduler
+
+
+MEDIA_GROUP_LIMIT = 10
 
 
 class TelegramSender:
-    def __init__(self, bot: Bot, chat_id: str):
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: str,
+        scheduler: TelegramScheduler | None = None,
+        message_thread_id: int | None = None,
+    ):
         self.bot = bot
         self.chat_id = str(chat_id)
+        self.scheduler = scheduler
+        self.message_thread_id = message_thread_id
 
     async def send_text(self, content: str) -> None:
         logging.info("Sending text message")
-        await self.bot.send_message(chat_id=self.chat_id, text=content)
+        await self._call(self.bot.send_message, chat_id=self.chat_id, text=content)
         logging.info("Successfully sent text message")
 
     async def send_media_and_documents(
         self,
         media: list,
-        documents: list[tuple],
+        documents: list[InputMediaDocument],
         content: str,
         file_objects: list,
-    ) -> None:
+    ) -> list[str | None]:
+        media_file_ids: list[str | None] = [None] * len(media)
+        document_file_ids: list[str | None] = [None] * len(documents)
         try:
             logging.info(
                 "Preparing to send %d media files and %d documents to Telegram",
@@ -28,32 +46,23 @@ class TelegramSender:
             )
 
             if media:
-                if len(media) == 1:
-                    await self._send_single_media(media[0], content)
-                else:
-                    await self._send_media_group(media, content)
-            elif content:
+                media_file_ids = await self._send_album(media)
+            elif content and not documents:
                 await self.send_text(content)
 
-            for file_obj, filename in documents:
-                logging.info("Sending document: %s", filename)
-                await self.bot.send_document(
-                    chat_id=self.chat_id,
-                    document=file_obj,
-                    filename=filename,
-                    caption=content,
-                )
-                logging.info("Successfully sent document: %s", filename)
+            if documents:
+                document_file_ids = await self._send_album(documents)
         except Exception as error:
             logging.error("Sending to Telegram failed: %s", error)
             logging.error("Exception details:", exc_info=True)
         finally:
             try:
-                for file_obj in file_objects:
-                    file_obj.close()
+                await asyncio.to_thread(_close_files, file_objects)
             except Exception as error:
                 logging.error("Closing files failed: %s", error)
 
+        return media_file_ids + document_file_ids
+
     async def send_attachment_urls(self, attachments, content: str) -> None:
         logging.warning("No files downloaded successfully, attempting to send URLs directly")
         for index, attachment in enumerate(attachments):
@@ -61,19 +70,22 @@ class TelegramSender:
                 current_caption = content if index == 0 else None
 
                 if attachment.content_type and "image" in attachment.content_type:
-                    await self.bot.send_photo(
+                    await self._call(
+                        self.bot.send_photo,
                         chat_id=self.chat_id,
                         photo=attachment.url,
                         caption=current_caption,
                     )
                 elif attachment.content_type and "video" in attachment.content_type:
-                    await self.bot.send_video(
+                    await self._call(
+                        self.bot.send_video,
                         chat_id=self.chat_id,
                         video=attachment.url,
                         caption=current_caption,
                     )
                 else:
-                    await self.bot.send_document(
+                    await self._call(
+                        self.bot.send_document,
                         chat_id=self.chat_id,
                         document=attachment.url,
                         filename=attachment.filename,
@@ -84,32 +96,36 @@ class TelegramSender:
                 logging.error("Failed to send URL directly for %s: %s", attachment.filename, error)
                 logging.error("Exception details:", exc_info=True)
 
-    async def _send_single_media(self, media_item, content: str | None) -> None:
+    async def _send_single_media(self, media_item, content: str | None) -> Message:
         logging.info("Sending single media file of type: %s", type(media_item).__name__)
 
         if isinstance(media_item, InputMediaAnimation):
-            await self.bot.send_animation(
+            sent_message = await self._call(
+                self.bot.send_animation,
                 chat_id=self.chat_id,
                 animation=media_item.media,
                 caption=content,
                 has_spoiler=media_item.has_spoiler,
             )
         elif isinstance(media_item, InputMediaPhoto):
-            await self.bot.send_photo(
+            sent_message = await self._call(
+                self.bot.send_photo,
                 chat_id=self.chat_id,
                 photo=media_item.media,
                 caption=content,
                 has_spoiler=media_item.has_spoiler,
             )
         elif isinstance(media_item, InputMediaVideo):
-            await self.bot.send_video(
+            sent_message = await self._call(
+                self.bot.send_video,
                 chat_id=self.chat_id,
                 video=media_item.media,
                 caption=content,
                 has_spoiler=media_item.has_spoiler,
             )
         else:
-            await self.bot.send_document(
+            sent_message = await self._call(
+                self.bot.send_document,
                 chat_id=self.chat_id,
                 document=media_item.media,
                 filename=getattr(media_item, "filename", "document"),
@@ -117,19 +133,66 @@ class TelegramSender:
             )
 
         logging.info("Successfully sent single media file")
+        return sent_message
+
+    async def _send_album(self, items: list) -> list[str | None]:
+        file_ids: list[str | None] = []
+        for group in split_media_groups(items):
+            try:
+                if len(group) == 1:
+                    sent_message = await self._send_single_media(group[0], group[0].caption)
+                    file_ids.append(telegram_file_id(sent_message))
+                else:
+                    file_ids.extend(await self._send_media_group(group))
+            except Exception as error:
+                logging.error("Failed to send media group of %d files: %s", len(group), error)
+                logging.error("Exception details:", exc_info=True)
+                file_ids.extend([None] * len(group))
+
+        return file_ids
 
-    async def _send_media_group(self, media: list, content: str) -> None:
+    async def _send_media_group(self, media: list) -> list[str | None]:
         logging.info("Sending media group with %d files", len(media))
+        sent_messages = await self._call(
+            self.bot.send_media_group,
+            cost=len(media),
+            chat_id=self.chat_id,
+            media=media,
+        )
+        logging.info("Successfully sent media group")
+        return [telegram_file_id(sent_message) for sent_message in sent_messages]
 
-        if len(media) > 10:
-            logging.error("Too many media files for media group (max 10): %d", len(media))
-            for index, single_media in enumerate(media):
-                try:
-                    current_caption = content if index == 0 else None
-                    await self._send_single_media(single_media, current_caption)
-                    logging.info("Successfully sent individual media file %d/%d", index + 1, len(media))
-                except Exception as error:
-                    logging.error("Failed to send individual media file %d: %s", index + 1, error)
-        else:
-            await self.bot.send_media_group(chat_id=self.chat_id, media=media)
-            logging.info("Successfully sent media group")
+    async def _call(self, method: Callable[..., Awaitable[Any]], cost: int = 1, **kwargs) -> Any:
+        if self.message_thread_id is not None:
+            kwargs["message_thread_id"] = self.message_thread_id
+        operation = partial(method, **kwargs)
+        if self.scheduler is None:
+            return await operation()
+        return await self.scheduler.run(self.chat_id, operation, cost=cost)
+
+
+def telegram_file_id(message: Message) -> str | None:
+    attachment = message.effective_attachment
+    if isinstance(attachment, tuple):
+        attachment = attachment[-1] if attachment else None
+    return getattr(attachment, "file_id", None)
+
+
+def split_media_groups(items: list, limit: int = MEDIA_GROUP_LIMIT) -> list[list]:
+    if not items:
+        return []
+
+    group_count = -(-len(items) // limit)
+    group_size, remainder = divmod(len(items), group_count)
+    groups = []
+    start = 0
+    for index in range(group_count):
+        end = start + group_size + (1 if index < remainder else 0)
+        groups.append(items[start:end])
+        start = end
+    return groups
+
+
+def _close_files(file_objects: list) -> None:
+    for file_obj in file_objects:
+        file_obj.close()
@@ -0,0 +1,93 @@
+import asyncio
+import importlib.util
+import logging
+
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+
+
+DEFAULT_API_POOL_SIZE = 16
+DEFAULT_UPLOAD_POOL_SIZE = 4
+DEFAULT_API_READ_TIMEOUT_SECONDS = 5.0
+DEFAULT_UPLOAD_READ_TIMEOUT_SECONDS = 120.0
+DEFAULT_UPLOAD_WRITE_TIMEOUT_SECONDS = 300.0
+DEFAULT_WARM_UP_CONNECTIONS = 4
+
+
+class TelegramTransport(BaseRequest):
+    def __init__(self, api_request: BaseRequest, upload_request: BaseRequest):
+        self.api_request = api_request
+        self.upload_request = upload_request
+
+    @property
+    def read_timeout(self) -> float | None:
+        return self.api_request.read_timeout
+
+    async def initialize(self) -> None:
+        await asyncio.gather(self.api_request.initialize(), self.upload_request.initialize())
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(self.api_request.shutdown(), self.upload_request.shutdown())
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: RequestData | None = None,
+        read_timeout=BaseRequest.DEFAULT_NONE,
+        write_timeout=BaseRequest.DEFAULT_NONE,
+        connect_timeout=BaseRequest.DEFAULT_NONE,
+        pool_timeout=BaseRequest.DEFAULT_NONE,
+    ) -> tuple[int, bytes]:
+        uploads_files = request_data is not None and request_data.contains_files
+        request = self.upload_request if uploads_files else self.api_request
+        return await request.do_request(
+            url,
+            method,
+            request_data,
+            read_timeout=read_timeout,
+            write_timeout=write_timeout,
+            connect_timeout=connect_timeout,
+            pool_timeout=pool_timeout,
+        )
+
+    async def warm_up(self, url: str, connections: int = DEFAULT_WARM_UP_CONNECTIONS) -> None:
+        requests = [self.api_request] * connections + [self.upload_request] * connections
+        results = await asyncio.gather(
+            *(request.do_request(url, "POST") for request in requests),
+            return_exceptions=True,
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logging.warning("Could not warm up %d Telegram connections: %s", len(failures), failures[0])
+        else:
+            logging.info("Warmed up %d Telegram connections", len(results))
+
+
+def create_transport(
+    api_pool_size: int = DEFAULT_API_POOL_SIZE,
+    upload_pool_size: int = DEFAULT_UPLOAD_POOL_SIZE,
+    api_read_timeout_seconds: float = DEFAULT_API_READ_TIMEOUT_SECONDS,
+    upload_read_timeout_seconds: float = DEFAULT_UPLOAD_READ_TIMEOUT_SECONDS,
+    upload_write_timeout_seconds: float = DEFAULT_UPLOAD_WRITE_TIMEOUT_SECONDS,
+    http2: bool = False,
+) -> TelegramTransport:
+    if http2 and importlib.util.find_spec("h2") is None:
+        logging.warning("HTTP/2 needs the h2 package (pip install 'httpx[http2]'), using HTTP/1.1")
+        http2 = False
+
+    http_version = "2" if http2 else "1.1"
+    return TelegramTransport(
+        api_request=HTTPXRequest(
+            connection_pool_size=api_pool_size,
+            read_timeout=api_read_timeout_seconds,
+            http_version=http_version,
+        ),
+        upload_request=HTTPXRequest(
+            connection_pool_size=upload_pool_size,
+            read_timeout=upload_read_timeout_seconds,
+            write_timeout=upload_write_timeout_seconds,
+            media_write_timeout=upload_write_timeout_seconds,
+            pool_timeout=upload_write_timeout_seconds,
+            http_version=http_version,
+        ),
+    )
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+
+DEFAULT_INTERVAL_SECONDS = 300.0
+DEFAULT_MAX_AGE_SECONDS = 60 * 60
+DEFAULT_QUOTA_BYTES = 1024 * 1024 * 1024
+DEFAULT_GRACE_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class SweepResult:
+    removed_files: int
+    removed_bytes: int
+    remaining_bytes: int
+
+
+@dataclass(frozen=True)
+class _TempFile:
+    path: str
+    size: int
+    modified_at: float
+
+
+class TempJanitor:
+    def __init__(
+        self,
+        directory: str,
+        interval_seconds: float = DEFAULT_INTERVAL_SECONDS,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+        quota_bytes: int = DEFAULT_QUOTA_BYTES,
+        grace_seconds: float = DEFAULT_GRACE_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.directory = directory
+        self.interval_seconds = interval_seconds
+        self.max_age_seconds = max_age_seconds
+        self.quota_bytes = quota_bytes
+        self.grace_seconds = grace_seconds
+        self.clock = clock
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        logging.info("Starting temp directory janitor for %s/", self.directory)
+        self._task = asyncio.create_task(self._run(), name="temp-janitor")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def sweep(self) -> SweepResult:
+        result = await asyncio.to_thread(self._sweep)
+        if result.removed_files:
+            logging.info(
+                "Janitor removed %d files (%d bytes) from %s/, %d bytes remain",
+                result.removed_files,
+                result.removed_bytes,
+                self.directory,
+                result.remaining_bytes,
+            )
+        return result
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as error:
+                logging.error("Temp directory janitor failed: %s", error)
+                logging.error("Exception details:", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    def _sweep(self) -> SweepResult:
+        now = self.clock()
+        files = sorted(self._list_files(), key=lambda temp_file: temp_file.modified_at)
+        total_bytes = sum(temp_file.size for temp_file in files)
+        removed_files = 0
+        removed_bytes = 0
+
+        for temp_file in files:
+            age = now - temp_file.modified_at
+            if age < self.grace_seconds:
+                break
+
+            if age < self.max_age_seconds and total_bytes <= self.quota_bytes:
+                continue
+
+            if self._remove(temp_file.path):
+                removed_files += 1
+                removed_bytes += temp_file.size
+                total_bytes -= temp_file.size
+
+        if total_bytes > self.quota_bytes:
+            logging.warning(
+                "Temp directory %s/ holds %d bytes, above the %d byte quota, in files still in use",
+                self.directory,
+                total_bytes,
+                self.quota_bytes,
+            )
+
+        return SweepResult(removed_files, removed_bytes, total_bytes)
+
+    def _list_files(self) -> list[_TempFile]:
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+
+        files = []
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            files.append(_TempFile(entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        except OSError as error:
+            logging.error("Janitor could not remove %s: %s", path, error)
+            return False
+        return True
@@ -1,12 +1,29 @@
+import asyncio
 import logging
+import signal
 import sys
 
 import discord
+from discord.utils import utcnow
 from telegram import Bot
 
-from bot.config import ConfigError, load_config
+from bot.attachment_cache import AttachmentCache
+from bot.attachment_downloader import AttachmentDownloader
+from bot.backfill import Backfiller
+from bot.config import BotConfig, ConfigError, TelegramTarget, load_config, load_routes
+from bot.loop_monitor import LoopLagMonitor
+from bot.media_classifier import DEFAULT_MEDIA_LIMITS, LOCAL_BOT_API_MEDIA_LIMITS, MediaLimits
+from bot.media_processor import MediaProcessor
+from bot.metrics import REGISTRY, STAGE_SECONDS, MetricsRegistry, MetricsServer
+from bot.repost_job import job_from_message
+from bot.repost_queue import RepostQueue
 from bot.repost_service import RepostService
+from bot.repost_worker import RepostWorkerPool
+from bot.routing import RoutingTable
+from bot.telegram_scheduler import TelegramScheduler
 from bot.telegram_sender import TelegramSender
+from bot.telegram_transport import TelegramTransport, create_transport
+from bot.temp_janitor import TempJanitor
 
 
 def create_discord_client() -> discord.Client:
@@ -15,6 +32,241 @@ def create_discord_client() -> discord.Client:
     return discord.Client(intents=intents)
 
 
+def create_attachment_downloader(config: BotConfig) -> AttachmentDownloader:
+    return AttachmentDownloader(
+        temp_dir=config.temp_dir,
+        max_concurrency_per_message=config.download_concurrency_per_message,
+        max_concurrency=config.download_concurrency_global,
+        connection_limit=config.download_connection_limit,
+        connection_limit_per_host=config.download_connection_limit_per_host,
+        dns_cache_ttl_seconds=config.download_dns_cache_ttl_seconds,
+        keepalive_timeout_seconds=config.download_keepalive_timeout_seconds,
+        chunk_size_bytes=config.download_chunk_size_bytes,
+        relay_mode=config.relay_mode,
+        relay_spool_max_bytes=config.relay_spool_max_bytes,
+    )
+
+
+def create_telegram_scheduler(config: BotConfig) -> TelegramScheduler:
+    return TelegramScheduler(
+        global_rate_per_second=config.telegram_global_rate_per_second,
+        chat_rate_per_minute=config.telegram_chat_rate_per_minute,
+        chat_burst=config.telegram_chat_burst,
+        max_retries=config.telegram_max_retries,
+    )
+
+
+def media_limits(config: BotConfig) -> MediaLimits:
+    return LOCAL_BOT_API_MEDIA_LIMITS if config.telegram_local_mode else DEFAULT_MEDIA_LIMITS
+
+
+def create_media_processor(config: BotConfig) -> MediaProcessor | None:
+    if not config.media_processing:
+        return None
+
+    return MediaProcessor(
+        max_workers=config.media_processing_workers,
+        timeout_seconds=config.media_processing_timeout_seconds,
+        max_input_bytes=config.media_processing_max_input_bytes,
+        limits=media_limits(config),
+    )
+
+
+def create_telegram_bot(config: BotConfig) -> Bot:
+    return Bot(
+        token=config.telegram_bot_token,
+        base_url=config.telegram_api_url,
+        local_mode=config.telegram_local_mode,
+        request=create_transport(
+            api_pool_size=config.telegram_connection_pool_size,
+            upload_pool_size=config.telegram_upload_pool_size,
+            api_read_timeout_seconds=config.telegram_read_timeout_seconds,
+            upload_read_timeout_seconds=config.telegram_upload_read_timeout_seconds,
+            upload_write_timeout_seconds=config.telegram_upload_write_timeout_seconds,
+            http2=config.telegram_http2,
+        ),
+    )
+
+
+async def warm_up_telegram(bot: Bot, config: BotConfig) -> None:
+    try:
+        await bot.initialize()
+    except Exception as error:
+        logging.error("Could not reach the Telegram Bot API at startup: %s", error)
+        return
+
+    logging.info("Logged in to Telegram as @%s", bot.username)
+    if config.telegram_warm_up_connections and isinstance(bot.request, TelegramTransport):
+        await bot.request.warm_up(f"{bot.base_url}/getMe", config.telegram_warm_up_connections)
+
+
+def create_routing_table(config: BotConfig, bot: Bot, telegram_scheduler: TelegramScheduler) -> RoutingTable:
+    def create_sender(target: TelegramTarget) -> TelegramSender:
+        return TelegramSender(
+            bot=bot,
+            chat_id=target.chat_id,
+            scheduler=telegram_scheduler,
+            message_thread_id=target.topic_id,
+        )
+
+    return RoutingTable(config.routes, create_sender)
+
+
+def reload_routes(routing: RoutingTable, config: BotConfig) -> None:
+    if not config.routes_path:
+        logging.warning("Received SIGHUP, but ROUTES_PATH is not set; routes come from the environment")
+        return
+
+    logging.info("Reloading routes from %s", config.routes_path)
+    try:
+        routing.load(load_routes(config.routes_path))
+    except ConfigError as error:
+        logging.error("Keeping the current routes: %s", error)
+
+
+def install_reload_handler(routing: RoutingTable, config: BotConfig) -> None:
+    if not hasattr(signal, "SIGHUP"):
+        return
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_routes, routing, config)
+
+
+def create_repost_service(
+    config: BotConfig,
+    routing: RoutingTable,
+    attachment_downloader: AttachmentDownloader,
+    attachment_cache: AttachmentCache,
+    media_processor: MediaProcessor | None,
+) -> RepostService:
+    return RepostService(
+        routing=routing,
+        temp_dir=config.temp_dir,
+        downloader=attachment_downloader,
+        cache=attachment_cache,
+        url_passthrough=config.url_passthrough,
+        processor=media_processor,
+        limits=media_limits(config),
+        local_mode=config.telegram_local_mode,
+    )
+
+
+def create_repost_queue(config: BotConfig) -> RepostQueue:
+    return RepostQueue(
+        config.repost_queue_path,
+        max_attempts=config.repost_max_attempts,
+        coalesce_window_seconds=config.repost_coalesce_window_ms / 1000,
+        coalesce_max_messages=config.repost_coalesce_max_messages,
+    )
+
+
+def create_attachment_cache(config: BotConfig) -> AttachmentCache:
+    return AttachmentCache(
+        config.attachment_cache_path,
+        max_entries=config.attachment_cache_max_entries,
+        ttl_seconds=config.attachment_cache_ttl_seconds,
+    )
+
+
+def create_temp_janitor(config: BotConfig, attachment_downloader: AttachmentDownloader) -> TempJanitor:
+    return TempJanitor(
+        attachment_downloader.download_dir,
+        interval_seconds=config.temp_janitor_interval_seconds,
+        max_age_seconds=config.temp_max_age_seconds,
+        quota_bytes=config.temp_quota_bytes,
+    )
+
+
+def register_metrics(
+    registry: MetricsRegistry,
+    repost_queue: RepostQueue,
+    telegram_scheduler: TelegramScheduler,
+    attachment_cache: AttachmentCache,
+    loop_monitor: LoopLagMonitor,
+) -> None:
+    registry.gauge("repost_queue_depth", "Repost jobs waiting in the queue.", repost_queue.depth)
+    registry.gauge(
+        "telegram_sends_total",
+        "Successful Telegram API calls.",
+        lambda: telegram_scheduler.stats.sends,
+        kind="counter",
+    )
+    registry.gauge(
+        "telegram_retries_total",
+        "Telegram API calls that were retried.",
+        lambda: telegram_scheduler.stats.retries,
+        kind="counter",
+    )
+    registry.gauge(
+        "telegram_retry_after_total",
+        "Telegram RetryAfter responses.",
+        lambda: telegram_scheduler.stats.retry_after_responses,
+        kind="counter",
+    )
+    registry.gauge(
+        "telegram_failures_total",
+        "Telegram API calls that failed.",
+        lambda: telegram_scheduler.stats.failures,
+        kind="counter",
+    )
+    registry.gauge(
+        "attachment_cache_hits_total",
+        "Attachment cache lookups that found a Telegram file_id.",
+        lambda: attachment_cache.stats.hits,
+        kind="counter",
+    )
+    registry.gauge(
+        "attachment_cache_misses_total",
+        "Attachment cache lookups that found nothing.",
+        lambda: attachment_cache.stats.misses,
+        kind="counter",
+    )
+    registry.gauge(
+        "event_loop_max_lag_seconds",
+        "Largest event loop lag seen since startup.",
+        lambda: loop_monitor.stats.max_lag_seconds,
+    )
+
+
+async def run_discord_client(
+    client: discord.Client,
+    config: BotConfig,
+    attachment_downloader: AttachmentDownloader,
+    attachment_cache: AttachmentCache,
+    repost_queue: RepostQueue,
+    worker_pool: RepostWorkerPool,
+    temp_janitor: TempJanitor,
+    loop_monitor: LoopLagMonitor,
+    media_processor: MediaProcessor | None,
+    routing: RoutingTable,
+    metrics_server: MetricsServer | None,
+    telegram_bot: Bot,
+) -> None:
+    install_reload_handler(routing, config)
+    loop_monitor.start()
+    await warm_up_telegram(telegram_bot, config)
+    if metrics_server is not None:
+        await metrics_server.start()
+    await attachment_cache.open()
+    await repost_queue.open()
+    temp_janitor.start()
+    worker_pool.start()
+    try:
+        async with client:
+            await client.start(config.discord_bot_token)
+    finally:
+        await worker_pool.stop()
+        await temp_janitor.stop()
+        await repost_queue.close()
+        await attachment_cache.close()
+        await attachment_downloader.close()
+        await telegram_bot.shutdown()
+        if media_processor is not None:
+            media_processor.close()
+        await loop_monitor.stop()
+        if metrics_server is not None:
+            await metrics_server.stop()
+
+
 def main() -> None:
     logging.basicConfig(level=logging.DEBUG)
 
@@ -25,33 +277,55 @@ def main() -> None:
         sys.exit(1)
 
     client = create_discord_client()
-    nsfw_telegram_sender = TelegramSender(
-        bot=Bot(token=config.telegram_bot_token),
-        chat_id=config.telegram_nsfw_chat_id,
-    )
-    sfw_telegram_sender = TelegramSender(
-        bot=Bot(token=config.telegram_bot_token),
-        chat_id=config.telegram_sfw_chat_id,
-    )
-    repost_service = RepostService(
-        nsfw_sender=nsfw_telegram_sender,
-        sfw_sender=sfw_telegram_sender,
-        nsfw_channel_ids=config.discord_nsfw_channel_ids,
-        sfw_channel_ids=config.discord_sfw_channel_ids,
-        temp_dir=config.temp_dir,
-    )
+    attachment_downloader = create_attachment_downloader(config)
+    telegram_scheduler = create_telegram_scheduler(config)
+    telegram_bot = create_telegram_bot(config)
+    routing = create_routing_table(config, telegram_bot, telegram_scheduler)
+    attachment_cache = create_attachment_cache(config)
+    media_processor = create_media_processor(config)
+    repost_service = create_repost_service(config, routing, attachment_downloader, attachment_cache, media_processor)
+    repost_queue = create_repost_queue(config)
+    backfiller = Backfiller(repost_queue, repost_service, max_messages_per_channel=config.backfill_max_messages)
+    worker_pool = RepostWorkerPool(repost_queue, repost_service, worker_count=config.repost_workers)
+    temp_janitor = create_temp_janitor(config, attachment_downloader)
+    loop_monitor = LoopLagMonitor(warning_threshold_seconds=config.loop_lag_warning_ms / 1000)
+    metrics_server = None
+    if config.metrics_port:
+        register_metrics(REGISTRY, repost_queue, telegram_scheduler, attachment_cache, loop_monitor)
+        metrics_server = MetricsServer(REGISTRY, config.metrics_host, config.metrics_port)
 
     @client.event
     async def on_ready() -> None:
         logging.info("Logged in to Discord as %s", client.user)
-        logging.info("NSFW Discord channels: %s", config.discord_nsfw_channel_ids)
-        logging.info("SFW Discord channels: %s", config.discord_sfw_channel_ids)
+        logging.info("Routed Discord channels: %s", sorted(routing.channel_ids))
+        if config.backfill_on_startup:
+            await backfiller.run(client, routing.channel_ids)
 
     @client.event
     async def on_message(message: discord.Message) -> None:
-        await repost_service.handle_message(message)
+        if repost_service.accepts(message):
+            STAGE_SECONDS.observe(max(0.0, (utcnow() - message.created_at).total_seconds()), stage="receive")
+            await repost_queue.enqueue(job_from_message(message))
 
-    client.run(config.discord_bot_token)
+    try:
+        asyncio.run(
+            run_discord_client(
+                client,
+                config,
+                attachment_downloader,
+                attachment_cache,
+                repost_queue,
+                worker_pool,
+                temp_janitor,
+                loop_monitor,
+                media_processor,
+                routing,
+                metrics_server,
+                telegram_bot,
+            )
+        )
+    except KeyboardInterrupt:
+        logging.info("Shutting down")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+import asyncio
+
+from bot.attachment_cache import AttachmentCache, CachedFile
+from bot.media_classifier import TelegramFileKind
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def run_with_cache(tmp_path, clock: FakeClock, scenario, **kwargs):
+    async def run():
+        cache = AttachmentCache(str(tmp_path / "cache.sqlite3"), clock=clock, **kwargs)
+        await cache.open()
+        try:
+            return await scenario(cache)
+        finally:
+            await cache.close()
+
+    return asyncio.run(run())
+
+
+def test_cache_finds_file_ids_by_attachment_and_by_hash(tmp_path) -> None:
+    async def scenario(cache: AttachmentCache):
+        await cache.remember_attachments({1: "hash-a"})
+        await cache.store([CachedFile("hash-a", TelegramFileKind.PHOTO, "file-a")])
+        return await cache.lookup_attachments([1, 2]), await cache.lookup_hashes(["hash-a", "hash-b"]), cache.stats
+
+    by_attachment, by_hash, stats = run_with_cache(tmp_path, FakeClock(), scenario)
+
+    assert by_attachment == {1: CachedFile("hash-a", TelegramFileKind.PHOTO, "file-a")}
+    assert by_hash == {"hash-a": CachedFile("hash-a", TelegramFileKind.PHOTO, "file-a")}
+    assert stats.hits == 2
+    assert stats.misses == 2
+
+
+def test_cache_entries_expire_after_ttl(tmp_path) -> None:
+    clock = FakeClock()
+
+    async def scenario(cache: AttachmentCache):
+        await cache.store([CachedFile("hash-a", TelegramFileKind.PHOTO, "file-a")])
+        clock.now += 61
+        return await cache.lookup_hashes(["hash-a"])
+
+    assert run_with_cache(tmp_path, clock, scenario, ttl_seconds=60) == {}
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path) -> None:
+    clock = FakeClock()
+
+    async def scenario(cache: AttachmentCache):
+        await cache.store([CachedFile("hash-a", TelegramFileKind.PHOTO, "file-a")])
+        clock.now += 1
+        await cache.store([CachedFile("hash-b", TelegramFileKind.PHOTO, "file-b")])
+        clock.now += 1
+        await cache.lookup_hashes(["hash-a"])
+        clock.now += 1
+        await cache.store([CachedFile("hash-c", TelegramFileKind.PHOTO, "file-c")])
+        return await cache.lookup_hashes(["hash-a", "hash-b", "hash-c"])
+
+    cached = run_with_cache(tmp_path, clock, scenario, max_entries=2)
+
+    assert set(cached) == {"hash-a", "hash-c"}
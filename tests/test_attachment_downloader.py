@@ -0,0 +1,179 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bot.attachment_downloader import AttachmentDownloader
+
+
+def make_attachment(server: TestServer, name: str):
+    return SimpleNamespace(
+        id=abs(hash(name)),
+        url=str(server.make_url(f"/{name}")),
+        filename=name,
+        size=5,
+        content_type="image/png",
+    )
+
+
+async def start_cdn(delays: dict[str, float], state: dict) -> TestServer:
+    async def handle(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        if name not in delays:
+            return web.Response(status=404)
+
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(delays[name])
+        finally:
+            state["active"] -= 1
+        return web.Response(body=name.encode())
+
+    app = web.Application()
+    app.router.add_get("/{name}", handle)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def test_downloads_keep_attachment_order(tmp_path) -> None:
+    async def run():
+        state = {"active": 0, "peak": 0}
+        server = await start_cdn({"a.png": 0.05, "b.png": 0.0, "c.png": 0.02}, state)
+        try:
+            attachments = [make_attachment(server, name) for name in ("a.png", "missing.png", "b.png", "c.png")]
+            downloader = AttachmentDownloader(str(tmp_path))
+            try:
+                return await downloader.download_to_temp_dir(attachments), state
+            finally:
+                await downloader.close()
+        finally:
+            await server.close()
+
+    local_files, state = asyncio.run(run())
+
+    assert [local_file.filename for local_file in local_files] == ["a.png", "b.png", "c.png"]
+    assert state["peak"] > 1
+
+
+def test_downloads_respect_global_limit(tmp_path) -> None:
+    async def run():
+        state = {"active": 0, "peak": 0}
+        names = [f"{index}.png" for index in range(6)]
+        server = await start_cdn({name: 0.01 for name in names}, state)
+        try:
+            attachments = [make_attachment(server, name) for name in names]
+            downloader = AttachmentDownloader(str(tmp_path), max_concurrency_per_message=4, max_concurrency=2)
+            try:
+                await downloader.download_to_temp_dir(attachments)
+            finally:
+                await downloader.close()
+            return state
+        finally:
+            await server.close()
+
+    state = asyncio.run(run())
+
+    assert state["peak"] <= 2
+
+
+def test_downloader_reuses_session_until_closed(tmp_path) -> None:
+    async def run():
+        downloader = AttachmentDownloader(str(tmp_path))
+        first_session = downloader._get_session()
+        second_session = downloader._get_session()
+        await downloader.close()
+        return first_session, second_session
+
+    first_session, second_session = asyncio.run(run())
+
+    assert first_session is second_session
+    assert first_session.closed
+
+
+def test_downloads_stream_content_to_disk_in_chunks(tmp_path) -> None:
+    body = bytes(range(256)) * 40
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=body)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/{name}", handle)
+        server = TestServer(app)
+        await server.start_server()
+        downloader = AttachmentDownloader(str(tmp_path), chunk_size_bytes=1000)
+        try:
+            return await downloader.download_to_temp_dir([make_attachment(server, "large.bin")])
+        finally:
+            await downloader.close()
+            await server.close()
+
+    local_files = asyncio.run(run())
+
+    assert len(local_files) == 1
+    assert open(local_files[0].path, "rb").read() == body
+    assert os.listdir(tmp_path / "downloads") == [os.path.basename(local_files[0].path)]
+
+
+def test_relay_mode_keeps_small_files_in_memory(tmp_path) -> None:
+    body = bytes(range(256)) * 40
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=body)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/{name}", handle)
+        server = TestServer(app)
+        await server.start_server()
+        downloader = AttachmentDownloader(str(tmp_path), relay_mode=True, relay_spool_max_bytes=len(body))
+        try:
+            return await downloader.download_to_temp_dir([make_attachment(server, "large.bin")])
+        finally:
+            await downloader.close()
+            await server.close()
+
+    local_files = asyncio.run(run())
+
+    assert local_files[0].path is None
+    assert local_files[0].size == len(body)
+    local_files[0].buffer.seek(0)
+    assert local_files[0].buffer.read() == body
+    assert os.listdir(tmp_path / "downloads") == []
+    local_files[0].buffer.close()
+
+
+def test_attachments_with_the_same_name_get_separate_files(tmp_path) -> None:
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=request.query["body"].encode())
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/{name}", handle)
+        server = TestServer(app)
+        await server.start_server()
+        attachments = [
+            SimpleNamespace(
+                id=attachment_id,
+                url=str(server.make_url(f"/image.png?body={attachment_id}")),
+                filename="image.png",
+                size=1,
+                content_type="image/png",
+            )
+            for attachment_id in (1, 2)
+        ]
+        downloader = AttachmentDownloader(str(tmp_path))
+        try:
+            return await downloader.download_to_temp_dir(attachments)
+        finally:
+            await downloader.close()
+            await server.close()
+
+    local_files = asyncio.run(run())
+
+    assert [open(local_file.path, "rb").read() for local_file in local_files] == [b"1", b"2"]
+    assert not any(name.endswith(".part") for name in os.listdir(tmp_path / "downloads"))
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+from bot.backfill import Backfiller
+from bot.repost_job import RepostJob
+from bot.repost_queue import RepostQueue
+
+
+def make_message(message_id: int, channel_id: int = 123, author_is_bot: bool = False):
+    return SimpleNamespace(
+        id=message_id,
+        author=SimpleNamespace(id=2, bot=author_is_bot),
+        channel=SimpleNamespace(id=channel_id),
+        content=f"message {message_id}",
+        attachments=[],
+    )
+
+
+def make_client(messages: list, requests: list):
+    def history(limit, after, oldest_first):
+        requests.append((limit, after.id, oldest_first))
+
+        async def iterate():
+            newer = [message for message in messages if message.id > after.id]
+            for message in newer[:limit]:
+                yield message
+
+        return iterate()
+
+    channel = SimpleNamespace(history=history)
+    return SimpleNamespace(get_channel=lambda channel_id: channel)
+
+
+def make_service():
+    return SimpleNamespace(accepts=lambda message: not message.author.bot)
+
+
+def test_backfill_queues_messages_after_checkpoint_in_order(tmp_path) -> None:
+    messages = [make_message(9), make_message(11), make_message(12, author_is_bot=True), make_message(13)]
+    requests = []
+
+    async def run():
+        queue = RepostQueue(str(tmp_path / "queue.sqlite3"))
+        await queue.open()
+        try:
+            await queue.enqueue(RepostJob(channel_id=123, message_id=10, author_id=2, content="seen"))
+            await queue.ack(await queue.claim())
+            backfiller = Backfiller(queue, make_service())
+            queued = await backfiller.run(make_client(messages, requests), [123, 456])
+            claimed = [await queue.claim()]
+            await queue.ack(claimed[0])
+            claimed.append(await queue.claim())
+            return queued, claimed
+        finally:
+            await queue.close()
+
+    queued, claimed = asyncio.run(run())
+
+    assert queued == 2
+    assert requests == [(1000, 10, True)]
+    assert [queued_job.job.message_id for queued_job in claimed] == [11, 13]
+
+
+def test_backfill_without_checkpoints_does_nothing(tmp_path) -> None:
+    requests = []
+
+    async def run():
+        queue = RepostQueue(str(tmp_path / "queue.sqlite3"))
+        await queue.open()
+        try:
+            backfiller = Backfiller(queue, make_service())
+            return await backfiller.run(make_client([make_message(1)], requests), [123])
+        finally:
+            await queue.close()
+
+    assert asyncio.run(run()) == 0
+    assert requests == []
+
+
+def test_backfill_respects_explicit_start_and_limit(tmp_path) -> None:
+    messages = [make_message(message_id) for message_id in range(1, 6)]
+    requests = []
+
+    async def run():
+        queue = RepostQueue(str(tmp_path / "queue.sqlite3"))
+        await queue.open()
+        try:
+            backfiller = Backfiller(queue, make_service(), max_messages_per_channel=2)
+            return await backfiller.run(make_client(messages, requests), [123], after={123: 1})
+        finally:
+            await queue.close()
+
+    assert asyncio.run(run()) == 2
+    assert requests == [(2, 1, True)]
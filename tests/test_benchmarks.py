@@ -0,0 +1,44 @@
+import asyncio
+
+from benchmarks.fakes import FakeServerSettings
+from benchmarks.run import BenchmarkSettings, percentile, run_benchmark
+from benchmarks.scenarios import MessageSizes
+
+
+def test_percentile_uses_nearest_rank() -> None:
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) == 0
+
+
+def test_benchmark_moves_bytes_through_fake_servers() -> None:
+    settings = BenchmarkSettings(
+        scenario="sfw",
+        messages=3,
+        sizes=MessageSizes(photo_bytes=100_000, album_size=2),
+        url_passthrough=False,
+    )
+
+    report = asyncio.run(run_benchmark(settings))
+
+    assert report.messages == 3
+    assert report.downloaded_bytes == 3 * 2 * 100_000
+    assert report.uploaded_bytes == report.downloaded_bytes
+    assert report.telegram_calls["sendMediaGroup"] == 6
+    assert report.p99_latency_seconds >= report.p50_latency_seconds > 0
+
+
+def test_benchmark_retries_telegram_failures() -> None:
+    settings = BenchmarkSettings(
+        scenario="text",
+        messages=20,
+        telegram=FakeServerSettings(failure_ratio=0.2, seed=1),
+    )
+
+    report = asyncio.run(run_benchmark(settings))
+
+    assert report.telegram_failed > 0
+    assert report.telegram_retries >= report.telegram_failed
+    assert report.telegram_calls["sendMessage"] == 20
@@ -1,6 +1,8 @@
+import json
+
 import pytest
 
-from bot.config import ConfigError, load_config, parse_allowed_channel_ids
+from bot.config import ConfigError, TelegramTarget, load_config, load_routes, parse_allowed_channel_ids
 
 
 def test_parse_allowed_channel_ids() -> None:
@@ -70,3 +72,85 @@ def test_load_config_rejects_invalid_discord_channel_id() -> None:
                 "DISCORD_SFW_CHANNEL_IDS": "not-a-channel",
             }
         )
+
+
+def test_load_config_reads_relay_mode() -> None:
+    config = load_config(
+        {
+            "TELEGRAM_BOT_TOKEN": "telegram-token",
+            "TELEGRAM_NSFW_CHAT_ID": "telegram-nsfw-chat",
+            "TELEGRAM_SFW_CHAT_ID": "telegram-sfw-chat",
+            "DISCORD_BOT_TOKEN": "discord-token",
+            "RELAY_MODE": "true",
+        }
+    )
+
+    assert config.relay_mode is True
+
+
+def test_load_config_rejects_invalid_relay_mode() -> None:
+    with pytest.raises(ConfigError):
+        load_config(
+            {
+                "TELEGRAM_BOT_TOKEN": "telegram-token",
+                "TELEGRAM_NSFW_CHAT_ID": "telegram-nsfw-chat",
+                "TELEGRAM_SFW_CHAT_ID": "telegram-sfw-chat",
+                "DISCORD_BOT_TOKEN": "discord-token",
+                "RELAY_MODE": "sometimes",
+            }
+        )
+
+
+def test_load_config_requires_local_bot_api_url_for_local_mode() -> None:
+    env = {
+        "TELEGRAM_BOT_TOKEN": "telegram-token",
+        "TELEGRAM_NSFW_CHAT_ID": "telegram-nsfw-chat",
+        "TELEGRAM_SFW_CHAT_ID": "telegram-sfw-chat",
+        "DISCORD_BOT_TOKEN": "discord-token",
+        "TELEGRAM_LOCAL_MODE": "true",
+    }
+
+    with pytest.raises(ConfigError):
+        load_config(env)
+
+    config = load_config({**env, "TELEGRAM_API_URL": "http://telegram-bot-api:8081/bot"})
+
+    assert config.telegram_local_mode is True
+    assert config.telegram_api_url == "http://telegram-bot-api:8081/bot"
+    assert config.telegram_read_timeout_seconds == 600
+
+
+def test_load_config_reads_routes_file(tmp_path) -> None:
+    routes_path = tmp_path / "routes.json"
+    routes_path.write_text(
+        json.dumps(
+            {
+                "routes": [
+                    {
+                        "discord_channel_ids": [123, "456"],
+                        "telegram_targets": [{"chat_id": -100, "topic_id": 5}, {"chat_id": "other"}],
+                    }
+                ]
+            }
+        )
+    )
+
+    config = load_config(
+        {
+            "TELEGRAM_BOT_TOKEN": "telegram-token",
+            "DISCORD_BOT_TOKEN": "discord-token",
+            "ROUTES_PATH": str(routes_path),
+        }
+    )
+
+    targets = (TelegramTarget("-100", topic_id=5), TelegramTarget("other"))
+    assert config.routes == {123: targets, 456: targets}
+    assert config.telegram_nsfw_chat_id is None
+
+
+def test_load_routes_rejects_invalid_routes(tmp_path) -> None:
+    routes_path = tmp_path / "routes.json"
+    routes_path.write_text(json.dumps({"routes": [{"discord_channel_ids": [123]}]}))
+
+    with pytest.raises(ConfigError):
+        load_routes(str(routes_path))
@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+from bot.loop_monitor import LoopLagMonitor
+
+
+def test_monitor_records_blocked_event_loop() -> None:
+    async def run():
+        monitor = LoopLagMonitor(interval_seconds=0.01, warning_threshold_seconds=0.05)
+        monitor.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)
+        await asyncio.sleep(0.02)
+        await monitor.stop()
+        return monitor.stats
+
+    stats = asyncio.run(run())
+
+    assert stats.slow_samples >= 1
+    assert stats.max_lag_seconds >= 0.05
+
+
+def test_monitor_counts_only_slow_samples() -> None:
+    monitor = LoopLagMonitor(warning_threshold_seconds=0.1)
+
+    monitor.record(0.01)
+    monitor.record(0.2)
+
+    assert monitor.stats.samples == 2
+    assert monitor.stats.slow_samples == 1
+    assert monitor.stats.max_lag_seconds == 0.2
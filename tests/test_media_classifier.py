@@ -1,7 +1,10 @@
 from bot.media_classifier import (
+    LOCAL_BOT_API_MEDIA_LIMITS,
     TELEGRAM_FILE_LIMIT_BYTES,
     TELEGRAM_PHOTO_LIMIT_BYTES,
+    TELEGRAM_URL_PHOTO_LIMIT_BYTES,
     TelegramFileKind,
+    can_send_by_url,
     classify_file,
     is_spoiler_filename,
 )
@@ -58,3 +61,20 @@ def test_classify_oversized_document_as_skip() -> None:
     result = classify_file("large.zip", "application/zip", TELEGRAM_FILE_LIMIT_BYTES + 1)
 
     assert result.kind == TelegramFileKind.SKIP
+
+
+def test_local_bot_api_limits_allow_large_files() -> None:
+    video = classify_file("large.mp4", "video/mp4", TELEGRAM_FILE_LIMIT_BYTES + 1, LOCAL_BOT_API_MEDIA_LIMITS)
+    image = classify_file("large.png", "image/png", TELEGRAM_FILE_LIMIT_BYTES + 1, LOCAL_BOT_API_MEDIA_LIMITS)
+
+    assert video.kind == TelegramFileKind.VIDEO
+    assert image.kind == TelegramFileKind.DOCUMENT
+
+
+def test_can_send_by_url_respects_telegram_url_limits() -> None:
+    assert can_send_by_url("image.png", "image/png", TELEGRAM_URL_PHOTO_LIMIT_BYTES, TelegramFileKind.PHOTO)
+    assert not can_send_by_url("image.png", "image/png", TELEGRAM_URL_PHOTO_LIMIT_BYTES + 1, TelegramFileKind.PHOTO)
+    assert can_send_by_url("clip.mp4", "video/mp4", 1024, TelegramFileKind.VIDEO)
+    assert not can_send_by_url("clip.webm", "video/webm", 1024, TelegramFileKind.ANIMATION)
+    assert can_send_by_url("report.pdf", "application/pdf", 1024, TelegramFileKind.DOCUMENT)
+    assert not can_send_by_url("notes.txt", "text/plain", 1024, TelegramFileKind.DOCUMENT)
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.local_file import LocalFile
+from bot.media_classifier import TELEGRAM_FILE_LIMIT_BYTES, TELEGRAM_PHOTO_LIMIT_BYTES, TelegramFileKind
+from bot.media_processor import MediaProcessor
+
+
+def fake_shrinker(input_path: str, output_path: str, max_bytes: int) -> int:
+    with open(output_path, "wb") as file:
+        file.write(b"small")
+    return 5
+
+
+def test_output_kind_only_covers_files_that_need_processing() -> None:
+    processor = MediaProcessor()
+
+    assert processor.output_kind("large.png", "image/png", TELEGRAM_PHOTO_LIMIT_BYTES + 1) == TelegramFileKind.PHOTO
+    assert processor.output_kind("small.png", "image/png", 1024) is None
+    assert processor.output_kind("large.mp4", "video/mp4", TELEGRAM_FILE_LIMIT_BYTES + 1) == TelegramFileKind.VIDEO
+    assert processor.output_kind("clip.mov", "video/quicktime", 1024) == TelegramFileKind.VIDEO
+    assert processor.output_kind("clip.mp4", "video/mp4", 1024) is None
+    assert processor.output_kind("huge.mp4", "video/mp4", processor.max_input_bytes + 1) is None
+
+
+def test_oversized_images_are_replaced_by_processed_files(tmp_path) -> None:
+    image_path = tmp_path / "SPOILER_large.png"
+    image_path.write_bytes(b"large")
+    local_file = LocalFile(
+        path=str(image_path),
+        filename="SPOILER_large.png",
+        content_type="image/png",
+        has_spoiler=True,
+        size=TELEGRAM_PHOTO_LIMIT_BYTES + 1,
+    )
+    processor = MediaProcessor(executor=ThreadPoolExecutor(max_workers=1), image_shrinker=fake_shrinker)
+
+    processed = asyncio.run(processor.process([local_file]))[0]
+    processor.close()
+
+    assert processed.filename == "SPOILER_large.jpg"
+    assert processed.content_type == "image/jpeg"
+    assert processed.size == 5
+    assert processed.has_spoiler
+    assert open(processed.path, "rb").read() == b"small"
+    assert not image_path.exists()
+
+
+def test_processing_that_runs_out_of_time_keeps_the_original(tmp_path) -> None:
+    def slow_shrinker(input_path: str, output_path: str, max_bytes: int) -> int:
+        time.sleep(0.2)
+        return fake_shrinker(input_path, output_path, max_bytes)
+
+    image_path = tmp_path / "large.png"
+    image_path.write_bytes(b"large")
+    local_file = LocalFile(
+        path=str(image_path),
+        filename="large.png",
+        content_type="image/png",
+        size=TELEGRAM_PHOTO_LIMIT_BYTES + 1,
+    )
+    processor = MediaProcessor(
+        timeout_seconds=0.05,
+        executor=ThreadPoolExecutor(max_workers=1),
+        image_shrinker=slow_shrinker,
+    )
+
+    processed = asyncio.run(processor.process([local_file]))[0]
+    processor.close()
+
+    assert processed == local_file
+    assert image_path.exists()
@@ -0,0 +1,87 @@
+import asyncio
+import socket
+
+import aiohttp
+
+from bot.metrics import MetricsRegistry, MetricsServer
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Stage time.", ("stage",), buckets=(0.1, 1, 10))
+
+    histogram.observe(0.05, stage="download")
+    histogram.observe(0.5, stage="download")
+    histogram.observe(45, stage="download")
+
+    rendered = asyncio.run(registry.render())
+
+    assert "# TYPE stage_seconds histogram" in rendered
+    assert 'stage_seconds_bucket{stage="download",le="0.1"} 1' in rendered
+    assert 'stage_seconds_bucket{stage="download",le="1"} 2' in rendered
+    assert 'stage_seconds_bucket{stage="download",le="10"} 2' in rendered
+    assert 'stage_seconds_bucket{stage="download",le="+Inf"} 3' in rendered
+    assert 'stage_seconds_sum{stage="download"} 45.55' in rendered
+    assert 'stage_seconds_count{stage="download"} 3' in rendered
+    assert histogram.count(stage="download") == 3
+
+
+def test_registry_renders_counters_and_async_gauges() -> None:
+    registry = MetricsRegistry()
+    counter = registry.counter("files_total", "Files by kind.", ("kind",))
+    counter.inc(kind="photo")
+    counter.inc(2, kind="video")
+
+    async def depth():
+        return 7
+
+    registry.gauge("queue_depth", "Queue depth.", depth)
+    registry.gauge("retries_total", "Retries.", lambda: 3, kind="counter")
+
+    rendered = asyncio.run(registry.render())
+
+    assert 'files_total{kind="photo"} 1' in rendered
+    assert 'files_total{kind="video"} 2' in rendered
+    assert "# TYPE queue_depth gauge\nqueue_depth 7" in rendered
+    assert "# TYPE retries_total counter\nretries_total 3" in rendered
+
+
+def test_registry_skips_failing_gauges() -> None:
+    registry = MetricsRegistry()
+
+    def broken():
+        raise RuntimeError("closed")
+
+    registry.gauge("broken", "Broken.", broken)
+    registry.gauge("working", "Working.", lambda: 1)
+
+    rendered = asyncio.run(registry.render())
+
+    assert "broken" not in rendered
+    assert "working 1" in rendered
+
+
+def test_server_exposes_metrics_endpoint() -> None:
+    async def run():
+        registry = MetricsRegistry()
+        registry.counter("jobs_total", "Jobs.").inc()
+        server = MetricsServer(registry, "127.0.0.1", free_port())
+        await server.start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"http://127.0.0.1:{server.port}/metrics") as response:
+                    return response.status, response.content_type, await response.text()
+        finally:
+            await server.stop()
+
+    status, content_type, text = asyncio.run(run())
+
+    assert status == 200
+    assert content_type == "text/plain"
+    assert "jobs_total 1" in text
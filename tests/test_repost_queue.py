@@ -0,0 +1,225 @@
+import asyncio
+from dataclasses import replace
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from bot.repost_job import AttachmentInfo, RepostJob
+from bot.repost_queue import RepostQueue
+from bot.repost_worker import RepostWorkerPool
+
+
+def make_job(message_id: int, channel_id: int = 123) -> RepostJob:
+    return RepostJob(
+        channel_id=channel_id,
+        message_id=message_id,
+        author_id=1,
+        content=f"message {message_id}",
+        attachments=(
+            AttachmentInfo(
+                id=10,
+                filename="image.png",
+                url="https://cdn.example/image.png",
+                size=5,
+                content_type="image/png",
+            ),
+        ),
+    )
+
+
+def test_repost_job_round_trips_through_json() -> None:
+    job = make_job(1)
+
+    assert RepostJob.from_json(job.to_json()) == job
+
+
+def test_queue_claims_jobs_in_order_and_ignores_duplicates(tmp_path) -> None:
+    async def run():
+        queue = RepostQueue(str(tmp_path / "queue.sqlite3"))
+        await queue.open()
+        try:
+            await queue.enqueue(make_job(1, channel_id=123))
+            await queue.enqueue(make_job(2, channel_id=456))
+            await queue.enqueue(make_job(1, channel_id=123))
+            first = await queue.claim()
+            second = await queue.claim()
+            empty = await queue.claim()
+            await queue.ack(first)
+            return first, second, empty, await queue.depth()
+        finally:
+            await queue.close()
+
+    first, second, empty, depth = asyncio.run(run())
+
+    assert first.job.message_id == 1
+    assert second.job.message_id == 2
+    assert empty is None
+    assert depth == 1
+
+
+def test_queue_keeps_channel_order_while_other_channels_proceed(tmp_path) -> None:
+    async def run():
+        queue = RepostQueue(str(tmp_path / "queue.sqlite3"))
+        await queue.open()
+        try:
+            await queue.enqueue(make_job(1, channel_id=123))
+            await queue.enqueue(make_job(2, channel_id=123))
+            await queue.enqueue(make_job(3, channel_id=456))
+            claimed = [await queue.claim(), await queue.claim(), await queue.claim()]
+            await queue.ack(claimed[0])
+            claimed.append(await queue.claim())
+            return claimed
+        finally:
+            await queue.close()
+
+    first, second, blocked, after_ack = asyncio.run(run())
+
+    assert first.job.message_id == 1
+    assert second.job.message_id == 3
+    assert blocked is None
+    assert after_ack.job.message_id == 2
+
+
+def test_queue_recovers_unacknowledged_jobs_after_restart(tmp_path) -> None:
+    path = str(tmp_path / "queue.sqlite3")
+
+    async def crash():
+        queue = RepostQueue(path)
+        await queue.open()
+        await queue.enqueue(make_job(1))
+        await queue.claim()
+        await queue.close()
+
+    async def restart():
+        queue = RepostQueue(path)
+        await queue.open()
+        try:
+            return await queue.claim()
+        finally:
+            await queue.close()
+
+    asyncio.run(crash())
+    recovered = asyncio.run(restart())
+
+    assert recovered.job == make_job(1)
+    assert recovered.attempts == 2
+
+
+def test_queue_gives_up_after_max_attempts(tmp_path) -> None:
+    async def run():
+        queue = RepostQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2)
+        await queue.open()
+        try:
+            await queue.enqueue(make_job(1))
+            await queue.release(await queue.claim())
+            await queue.release(await queue.claim())
+            return await queue.claim(), await queue.depth()
+        finally:
+            await queue.close()
+
+    claimed, depth = asyncio.run(run())
+
+    assert claimed is None
+    assert depth == 0
+
+
+def test_worker_pool_delivers_and_acknowledges_jobs(tmp_path) -> None:
+    async def run():
+        queue = RepostQueue(str(tmp_path / "queue.sqlite3"))
+        repost_service = SimpleNamespace(deliver=AsyncMock())
+        worker_pool = RepostWorkerPool(queue, repost_service, worker_count=2)
+        await queue.open()
+        worker_pool.start()
+        try:
+            await queue.enqueue(make_job(1))
+            await queue.enqueue(make_job(2))
+            for _ in range(100):
+                if await queue.depth() == 0:
+                    break
+                await asyncio.sleep(0.01)
+            return repost_service, await queue.depth()
+        finally:
+            await worker_pool.stop()
+            await queue.close()
+
+    repost_service, depth = asyncio.run(run())
+
+    assert depth == 0
+    assert repost_service.deliver.await_count == 2
+
+
+def test_worker_pool_preserves_order_within_a_channel(tmp_path) -> None:
+    delivered: list[int] = []
+
+    async def deliver(job: RepostJob) -> None:
+        await asyncio.sleep(0.03 if job.message_id == 1 else 0)
+        delivered.append(job.message_id)
+
+    async def run():
+        queue = RepostQueue(str(tmp_path / "queue.sqlite3"))
+        worker_pool = RepostWorkerPool(queue, SimpleNamespace(deliver=deliver), worker_count=4)
+        await queue.open()
+        for message_id in (1, 2, 3):
+            await queue.enqueue(make_job(message_id))
+        worker_pool.start()
+        try:
+            for _ in range(100):
+                if await queue.depth() == 0:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await worker_pool.stop()
+            await queue.close()
+
+    asyncio.run(run())
+
+    assert delivered == [1, 2, 3]
+
+
+def test_queue_coalesces_bursts_from_the_same_author(tmp_path) -> None:
+    async def run():
+        queue = RepostQueue(str(tmp_path / "queue.sqlite3"), coalesce_window_seconds=0.05)
+        await queue.open()
+        try:
+            await queue.enqueue(make_job(1))
+            await queue.enqueue(replace(make_job(2), content=""))
+            await queue.enqueue(replace(make_job(3), content=""))
+            await queue.enqueue(replace(make_job(4), author_id=2, content=""))
+            too_early = await queue.claim()
+            await asyncio.sleep(0.06)
+            merged = await queue.claim()
+            await queue.ack(merged)
+            return too_early, merged, await queue.depth(), await queue.checkpoints()
+        finally:
+            await queue.close()
+
+    too_early, merged, depth, checkpoints = asyncio.run(run())
+
+    assert too_early is None
+    assert merged.job.message_id == 1
+    assert merged.job.content == "message 1"
+    assert len(merged.job.attachments) == 3
+    assert merged.merged_ids == (2, 3)
+    assert depth == 1
+    assert checkpoints == {123: 3}
+
+
+def test_queue_claims_backfilled_jobs_in_message_order_after_resume(tmp_path) -> None:
+    async def run():
+        queue = RepostQueue(str(tmp_path / "queue.sqlite3"))
+        await queue.open()
+        try:
+            queue.pause_channels([123])
+            await queue.enqueue(make_job(5))
+            inserted = await queue.enqueue_many([make_job(3), make_job(4), make_job(5)])
+            paused = await queue.claim()
+            queue.resume_channels([123])
+            first = await queue.claim()
+            return inserted, paused, first
+        finally:
+            await queue.close()
+
+    inserted, paused, first = asyncio.run(run())
+
+    assert inserted == 2
+    assert paused is None
+    assert first.job.message_id == 3
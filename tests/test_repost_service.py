@@ -1,27 +1,55 @@
 import asyncio
+import io
 from types import SimpleNamespace
 from unittest.mock import AsyncMock
 
+from telegram import Bot
+
+from benchmarks.fakes import FakeServerSettings, FakeTelegramApi
+from bot.attachment_cache import CachedFile
+from bot.config import default_routes
+from bot.local_file import LocalFile
+from bot.media_classifier import LOCAL_BOT_API_MEDIA_LIMITS, TELEGRAM_FILE_LIMIT_BYTES, TelegramFileKind
+from bot.media_processor import MediaProcessor
 from bot.repost_service import RepostService
+from bot.routing import RoutingTable
+from bot.telegram_sender import TelegramSender
 
 
-def make_message(channel_id: int, *, author_is_bot: bool = False):
+def make_message(channel_id: int, *, author_is_bot: bool = False, attachments=None):
     return SimpleNamespace(
-        author=SimpleNamespace(bot=author_is_bot),
+        id=1,
+        author=SimpleNamespace(id=2, bot=author_is_bot),
         channel=SimpleNamespace(id=channel_id),
         type=None,
         content="hello",
-        attachments=[],
+        attachments=attachments or [],
+    )
+
+
+def make_attachment(filename: str, content_type: str, size: int):
+    return SimpleNamespace(
+        id=3,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        url=f"https://cdn.example/{filename}",
     )
 
 
-def make_service(nsfw_sender, sfw_sender) -> RepostService:
+def make_routing(nsfw_sender, sfw_sender) -> RoutingTable:
+    senders = {"nsfw": nsfw_sender, "sfw": sfw_sender}
+    routes = default_routes("nsfw", "sfw", {123}, {456})
+    return RoutingTable(routes, lambda target: senders[target.chat_id])
+
+
+def make_service(nsfw_sender, sfw_sender, downloader=None, cache=None, url_passthrough=False) -> RepostService:
     return RepostService(
-        nsfw_sender=nsfw_sender,
-        sfw_sender=sfw_sender,
-        nsfw_channel_ids={123},
-        sfw_channel_ids={456},
+        routing=make_routing(nsfw_sender, sfw_sender),
         temp_dir="temp",
+        downloader=downloader,
+        cache=cache,
+        url_passthrough=url_passthrough,
     )
 
 
@@ -67,3 +95,204 @@ def test_bot_author_message_is_ignored() -> None:
 
     nsfw_sender.send_text.assert_not_awaited()
     sfw_sender.send_text.assert_not_awaited()
+
+
+def test_oversized_attachments_are_not_downloaded() -> None:
+    nsfw_sender = SimpleNamespace(send_text=AsyncMock())
+    sfw_sender = SimpleNamespace(send_text=AsyncMock())
+    downloader = SimpleNamespace(download_to_temp_dir=AsyncMock())
+    service = make_service(nsfw_sender, sfw_sender, downloader)
+    attachment = make_attachment("large.mp4", "video/mp4", TELEGRAM_FILE_LIMIT_BYTES + 1)
+
+    asyncio.run(service.handle_message(make_message(123, attachments=[attachment])))
+
+    downloader.download_to_temp_dir.assert_not_awaited()
+    nsfw_sender.send_text.assert_awaited_once_with("hello\nhttps://cdn.example/large.mp4")
+
+
+def test_only_sendable_attachments_are_downloaded() -> None:
+    nsfw_sender = SimpleNamespace(send_attachment_urls=AsyncMock())
+    sfw_sender = SimpleNamespace()
+    downloader = SimpleNamespace(download_to_temp_dir=AsyncMock(return_value=[]))
+    service = make_service(nsfw_sender, sfw_sender, downloader)
+    small = make_attachment("small.png", "image/png", 1024)
+    large = make_attachment("large.zip", "application/zip", TELEGRAM_FILE_LIMIT_BYTES + 1)
+
+    asyncio.run(service.handle_message(make_message(123, attachments=[small, large])))
+
+    downloaded_attachments = downloader.download_to_temp_dir.await_args.args[0]
+    assert [attachment.filename for attachment in downloaded_attachments] == ["small.png"]
+    nsfw_sender.send_attachment_urls.assert_awaited_once_with(downloaded_attachments, "hello")
+
+
+def test_sfw_attachments_are_uploaded_once_and_reused_by_file_id(tmp_path) -> None:
+    image_path = tmp_path / "image.png"
+    image_path.write_bytes(b"image")
+    local_file = LocalFile(path=str(image_path), filename="image.png", content_type="image/png", attachment_id=3)
+    nsfw_sender = SimpleNamespace(send_media_and_documents=AsyncMock(return_value=["telegram-file-id"]))
+    sfw_sender = SimpleNamespace(send_media_and_documents=AsyncMock(return_value=["telegram-file-id"]))
+    downloader = SimpleNamespace(download_to_temp_dir=AsyncMock(return_value=[local_file]))
+    service = make_service(nsfw_sender, sfw_sender, downloader)
+    attachment = make_attachment("image.png", "image/png", 5)
+
+    asyncio.run(service.handle_message(make_message(456, attachments=[attachment])))
+
+    _, _, _, nsfw_file_objects = nsfw_sender.send_media_and_documents.await_args.args
+    sfw_media, _, _, sfw_file_objects = sfw_sender.send_media_and_documents.await_args.args
+    assert len(nsfw_file_objects) == 1
+    assert sfw_media[0].media == "telegram-file-id"
+    assert sfw_file_objects == []
+
+
+def test_failing_telegram_target_does_not_block_other_targets() -> None:
+    nsfw_sender = SimpleNamespace(chat_id="nsfw", send_text=AsyncMock(side_effect=RuntimeError("boom")))
+    sfw_sender = SimpleNamespace(chat_id="sfw", send_text=AsyncMock())
+    service = make_service(nsfw_sender, sfw_sender)
+
+    asyncio.run(service.handle_message(make_message(456)))
+
+    sfw_sender.send_text.assert_awaited_once_with("hello")
+
+
+def test_cached_attachments_skip_download_and_upload() -> None:
+    nsfw_sender = SimpleNamespace(send_media_and_documents=AsyncMock(return_value=["telegram-file-id"]))
+    sfw_sender = SimpleNamespace()
+    downloader = SimpleNamespace(download_to_temp_dir=AsyncMock())
+    cache = SimpleNamespace(
+        lookup_attachments=AsyncMock(
+            return_value={3: CachedFile("hash", TelegramFileKind.PHOTO, "telegram-file-id")},
+        ),
+        store=AsyncMock(),
+    )
+    service = make_service(nsfw_sender, sfw_sender, downloader, cache)
+    attachment = make_attachment("image.png", "image/png", 5)
+
+    asyncio.run(service.handle_message(make_message(123, attachments=[attachment])))
+
+    downloader.download_to_temp_dir.assert_not_awaited()
+    media, _, _, file_objects = nsfw_sender.send_media_and_documents.await_args.args
+    assert media[0].media == "telegram-file-id"
+    assert file_objects == []
+
+
+def test_relayed_attachments_are_uploaded_from_memory() -> None:
+    buffer = io.BytesIO(b"image")
+    local_file = LocalFile(
+        path=None,
+        filename="image.png",
+        content_type="image/png",
+        attachment_id=3,
+        size=5,
+        buffer=buffer,
+    )
+    nsfw_sender = SimpleNamespace(send_media_and_documents=AsyncMock(return_value=[None]))
+    sfw_sender = SimpleNamespace(send_media_and_documents=AsyncMock(return_value=[None]))
+    downloader = SimpleNamespace(download_to_temp_dir=AsyncMock(return_value=[local_file]))
+    service = make_service(nsfw_sender, sfw_sender, downloader)
+    attachment = make_attachment("image.png", "image/png", 5)
+
+    asyncio.run(service.handle_message(make_message(456, attachments=[attachment])))
+
+    nsfw_media, _, _, _ = nsfw_sender.send_media_and_documents.await_args.args
+    sfw_media, _, _, _ = sfw_sender.send_media_and_documents.await_args.args
+    assert nsfw_media[0].media.input_file_content == b"image"
+    assert sfw_media[0].media.input_file_content == b"image"
+    downloader.download_to_temp_dir.assert_awaited_once()
+    assert buffer.closed
+
+
+def test_small_photos_are_passed_to_telegram_by_url() -> None:
+    nsfw_sender = SimpleNamespace(send_media_and_documents=AsyncMock(return_value=["telegram-file-id"]))
+    sfw_sender = SimpleNamespace()
+    downloader = SimpleNamespace(download_to_temp_dir=AsyncMock())
+    service = make_service(nsfw_sender, sfw_sender, downloader, url_passthrough=True)
+    attachment = make_attachment("image.png", "image/png", 5)
+
+    asyncio.run(service.handle_message(make_message(123, attachments=[attachment])))
+
+    downloader.download_to_temp_dir.assert_not_awaited()
+    media, _, _, file_objects = nsfw_sender.send_media_and_documents.await_args.args
+    assert media[0].media == "https://cdn.example/image.png"
+    assert file_objects == []
+
+
+def test_rejected_urls_fall_back_to_upload(tmp_path) -> None:
+    image_path = tmp_path / "image.png"
+    image_path.write_bytes(b"image")
+    local_file = LocalFile(path=str(image_path), filename="image.png", content_type="image/png", attachment_id=3)
+    nsfw_sender = SimpleNamespace(
+        send_media_and_documents=AsyncMock(side_effect=[[None], ["telegram-file-id"]]),
+    )
+    sfw_sender = SimpleNamespace()
+    downloader = SimpleNamespace(download_to_temp_dir=AsyncMock(return_value=[local_file]))
+    service = make_service(nsfw_sender, sfw_sender, downloader, url_passthrough=True)
+    attachment = make_attachment("image.png", "image/png", 5)
+
+    asyncio.run(service.handle_message(make_message(123, attachments=[attachment])))
+
+    retried_attachments = downloader.download_to_temp_dir.await_args.args[0]
+    assert [attachment.url for attachment in retried_attachments] == ["https://cdn.example/image.png"]
+    retried_media, _, _, file_objects = nsfw_sender.send_media_and_documents.await_args.args
+    assert retried_media[0].caption == "hello"
+    assert len(file_objects) == 1
+
+
+def test_oversized_videos_are_downloaded_when_they_can_be_transcoded() -> None:
+    nsfw_sender = SimpleNamespace(send_attachment_urls=AsyncMock())
+    sfw_sender = SimpleNamespace()
+    downloader = SimpleNamespace(download_to_temp_dir=AsyncMock(return_value=[]))
+    service = RepostService(
+        routing=make_routing(nsfw_sender, sfw_sender),
+        temp_dir="temp",
+        downloader=downloader,
+        url_passthrough=False,
+        processor=MediaProcessor(),
+    )
+    attachment = make_attachment("large.mp4", "video/mp4", TELEGRAM_FILE_LIMIT_BYTES + 1)
+
+    asyncio.run(service.handle_message(make_message(123, attachments=[attachment])))
+
+    downloaded_attachments = downloader.download_to_temp_dir.await_args.args[0]
+    assert [attachment.filename for attachment in downloaded_attachments] == ["large.mp4"]
+
+
+def test_local_mode_sends_file_paths_to_local_bot_api_server(tmp_path) -> None:
+    video_path = tmp_path / "large.mp4"
+    with open(video_path, "wb") as video:
+        video.truncate(TELEGRAM_FILE_LIMIT_BYTES + 1)
+    local_file = LocalFile(
+        path=str(video_path),
+        filename="large.mp4",
+        content_type="video/mp4",
+        attachment_id=3,
+        size=TELEGRAM_FILE_LIMIT_BYTES + 1,
+    )
+    downloader = SimpleNamespace(download_to_temp_dir=AsyncMock(return_value=[local_file]))
+    attachment = make_attachment("large.mp4", "video/mp4", TELEGRAM_FILE_LIMIT_BYTES + 1)
+
+    async def run():
+        server = FakeTelegramApi(FakeServerSettings())
+        await server.start()
+        bot = Bot(token="123:local", base_url=f"{server.url}/bot", local_mode=True)
+        sender = TelegramSender(bot, "-100")
+        service = RepostService(
+            routing=make_routing(sender, sender),
+            temp_dir=str(tmp_path),
+            downloader=downloader,
+            url_passthrough=False,
+            limits=LOCAL_BOT_API_MEDIA_LIMITS,
+            local_mode=True,
+        )
+        try:
+            await service.handle_message(make_message(123, attachments=[attachment]))
+        finally:
+            await bot.shutdown()
+            await server.stop()
+        return server
+
+    server = asyncio.run(run())
+
+    assert server.calls == {"sendVideo": 1}
+    assert server.local_paths == [str(video_path)]
+    assert server.bytes_received == 0
+    assert not video_path.exists()
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from bot.config import TelegramTarget, default_routes
+from bot.routing import RoutingTable
+
+
+def make_sender(target: TelegramTarget):
+    return SimpleNamespace(chat_id=target.chat_id, message_thread_id=target.topic_id)
+
+
+def test_routing_table_shares_one_sender_per_target() -> None:
+    routes = {
+        1: (TelegramTarget("chat-a"), TelegramTarget("chat-b", topic_id=7)),
+        2: (TelegramTarget("chat-b", topic_id=7), TelegramTarget("chat-b", topic_id=7)),
+    }
+
+    routing = RoutingTable(routes, make_sender)
+
+    first_senders = routing.senders_for_channel(1)
+    second_senders = routing.senders_for_channel(2)
+    assert [sender.chat_id for sender in first_senders] == ["chat-a", "chat-b"]
+    assert len(second_senders) == 1
+    assert second_senders[0] is first_senders[1]
+    assert routing.senders_for_channel(3) == ()
+
+
+def test_routing_table_reload_keeps_existing_senders() -> None:
+    created = []
+
+    def create_sender(target: TelegramTarget):
+        created.append(target)
+        return make_sender(target)
+
+    routing = RoutingTable({1: (TelegramTarget("chat-a"),)}, create_sender)
+    sender = routing.senders_for_channel(1)[0]
+
+    routing.load({2: (TelegramTarget("chat-a"), TelegramTarget("chat-c"))})
+
+    assert routing.senders_for_channel(1) == ()
+    assert routing.senders_for_channel(2)[0] is sender
+    assert created == [TelegramTarget("chat-a"), TelegramTarget("chat-c")]
+
+
+def test_default_routes_send_sfw_channels_to_both_chats() -> None:
+    routes = default_routes("nsfw", "sfw", {1}, {2})
+
+    assert routes == {
+        1: (TelegramTarget("nsfw"),),
+        2: (TelegramTarget("nsfw"), TelegramTarget("sfw")),
+    }
@@ -0,0 +1,87 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from bot.telegram_scheduler import TelegramScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_scheduler(clock: FakeClock, **kwargs) -> TelegramScheduler:
+    return TelegramScheduler(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_token_bucket_allows_burst_then_waits() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_second=1, capacity=2, clock=clock)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1)
+    assert bucket.reserve() == pytest.approx(2)
+
+
+def test_scheduler_spaces_out_sends_to_one_chat() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, chat_rate_per_minute=60, chat_burst=1)
+    operation = AsyncMock(return_value="sent")
+
+    async def run():
+        for _ in range(3):
+            await scheduler.run("chat", operation)
+
+    asyncio.run(run())
+
+    assert operation.await_count == 3
+    assert clock.sleeps == [pytest.approx(1), pytest.approx(1)]
+    assert scheduler.stats.sends == 3
+    assert scheduler.stats.max_wait_seconds == pytest.approx(1)
+
+
+def test_scheduler_waits_for_retry_after() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    operation = AsyncMock(side_effect=[RetryAfter(7), "sent"])
+
+    result = asyncio.run(scheduler.run("chat", operation))
+
+    assert result == "sent"
+    assert clock.sleeps == [pytest.approx(7)]
+    assert scheduler.stats.retry_after_responses == 1
+
+
+def test_scheduler_retries_network_errors_up_to_limit() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, max_retries=2)
+    operation = AsyncMock(side_effect=NetworkError("connection reset"))
+
+    with pytest.raises(NetworkError):
+        asyncio.run(scheduler.run("chat", operation))
+
+    assert operation.await_count == 3
+    assert scheduler.stats.retries == 2
+    assert scheduler.stats.failures == 1
+
+
+def test_scheduler_does_not_retry_bad_requests() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    operation = AsyncMock(side_effect=BadRequest("wrong file type"))
+
+    with pytest.raises(BadRequest):
+        asyncio.run(scheduler.run("chat", operation))
+
+    assert operation.await_count == 1
@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from telegram import InputMediaDocument, InputMediaPhoto
+
+from bot.telegram_sender import TelegramSender, split_media_groups, telegram_file_id
+
+
+def sent_message(file_id: str):
+    return SimpleNamespace(effective_attachment=SimpleNamespace(file_id=file_id))
+
+
+def test_split_media_groups_balances_groups_of_at_most_ten() -> None:
+    assert [len(group) for group in split_media_groups(list(range(10)))] == [10]
+    assert [len(group) for group in split_media_groups(list(range(11)))] == [6, 5]
+    assert [len(group) for group in split_media_groups(list(range(25)))] == [9, 8, 8]
+    assert split_media_groups([]) == []
+
+
+def test_telegram_file_id_uses_largest_photo_size() -> None:
+    message = SimpleNamespace(
+        effective_attachment=(SimpleNamespace(file_id="small"), SimpleNamespace(file_id="large")),
+    )
+
+    assert telegram_file_id(message) == "large"
+
+
+def test_large_albums_are_sent_as_several_media_groups() -> None:
+    async def send_media_group(chat_id, media):
+        return [sent_message(item.media) for item in media]
+
+    bot = SimpleNamespace(send_media_group=AsyncMock(side_effect=send_media_group))
+    sender = TelegramSender(bot, "chat")
+    media = [
+        InputMediaPhoto(media=f"photo-{index}", caption="hello" if index == 0 else None)
+        for index in range(12)
+    ]
+    documents = [InputMediaDocument(media=f"document-{index}") for index in range(2)]
+
+    file_ids = asyncio.run(sender.send_media_and_documents(media, documents, "hello", []))
+
+    groups = [call.kwargs["media"] for call in bot.send_media_group.await_args_list]
+    assert [len(group) for group in groups] == [6, 6, 2]
+    assert groups[0][0].caption == "hello"
+    assert file_ids == [f"photo-{index}" for index in range(12)] + ["document-0", "document-1"]
+
+
+def test_sender_posts_into_its_forum_topic() -> None:
+    bot = SimpleNamespace(send_message=AsyncMock())
+    sender = TelegramSender(bot, "chat", message_thread_id=7)
+
+    asyncio.run(sender.send_text("hello"))
+
+    bot.send_message.assert_awaited_once_with(chat_id="chat", text="hello", message_thread_id=7)
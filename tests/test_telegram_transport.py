@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from telegram import Bot
+
+from benchmarks.fakes import FakeServerSettings, FakeTelegramApi
+from bot.telegram_transport import TelegramTransport, create_transport
+
+
+def make_request():
+    return SimpleNamespace(do_request=AsyncMock(return_value=(200, b'{"ok": true, "result": true}')))
+
+
+def test_transport_sends_uploads_through_upload_pool() -> None:
+    api_request = make_request()
+    upload_request = make_request()
+    transport = TelegramTransport(api_request, upload_request)
+    text = SimpleNamespace(contains_files=False)
+    photo = SimpleNamespace(contains_files=True)
+
+    async def run():
+        await transport.do_request("https://api.example/sendMessage", "POST", text)
+        await transport.do_request("https://api.example/sendPhoto", "POST", photo)
+
+    asyncio.run(run())
+
+    assert api_request.do_request.await_args.args[0] == "https://api.example/sendMessage"
+    assert upload_request.do_request.await_args.args[0] == "https://api.example/sendPhoto"
+    assert api_request.do_request.await_count == 1
+    assert upload_request.do_request.await_count == 1
+
+
+def test_warm_up_opens_connections_in_both_pools() -> None:
+    api_request = make_request()
+    upload_request = make_request()
+    transport = TelegramTransport(api_request, upload_request)
+
+    asyncio.run(transport.warm_up("https://api.example/getMe", connections=2))
+
+    assert api_request.do_request.await_count == 2
+    assert upload_request.do_request.await_count == 2
+
+
+def test_bot_uses_shared_transport_against_fake_server() -> None:
+    async def run():
+        server = FakeTelegramApi(FakeServerSettings())
+        await server.start()
+        transport = create_transport(api_pool_size=2, upload_pool_size=1)
+        bot = Bot(token="123:transport", base_url=f"{server.url}/bot", request=transport)
+        try:
+            await bot.initialize()
+            await transport.warm_up(f"{bot.base_url}/getMe", connections=1)
+            await asyncio.gather(
+                bot.send_message(chat_id="-100", text="hello"),
+                bot.send_photo(chat_id="-100", photo=b"image"),
+            )
+        finally:
+            await bot.shutdown()
+            await server.stop()
+        return server
+
+    server = asyncio.run(run())
+
+    assert server.calls == {"getMe": 3, "sendMessage": 1, "sendPhoto": 1}
+    assert server.bytes_received == len(b"image")
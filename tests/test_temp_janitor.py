@@ -0,0 +1,47 @@
+import asyncio
+import os
+
+from bot.temp_janitor import TempJanitor
+
+
+def write_file(directory, name: str, size: int, modified_at: float) -> str:
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (modified_at, modified_at))
+    return str(path)
+
+
+def test_janitor_removes_files_older_than_max_age(tmp_path) -> None:
+    write_file(tmp_path, "orphan.png", 10, modified_at=1000)
+    write_file(tmp_path, "fresh.png", 10, modified_at=4500)
+    janitor = TempJanitor(str(tmp_path), max_age_seconds=3600, clock=lambda: 5000)
+
+    result = asyncio.run(janitor.sweep())
+
+    assert result.removed_files == 1
+    assert os.listdir(tmp_path) == ["fresh.png"]
+
+
+def test_janitor_enforces_quota_oldest_first(tmp_path) -> None:
+    write_file(tmp_path, "old.png", 60, modified_at=1000)
+    write_file(tmp_path, "middle.png", 60, modified_at=2000)
+    write_file(tmp_path, "in-use.png", 60, modified_at=4990)
+    janitor = TempJanitor(
+        str(tmp_path),
+        max_age_seconds=3600,
+        quota_bytes=100,
+        grace_seconds=60,
+        clock=lambda: 5000,
+    )
+
+    result = asyncio.run(janitor.sweep())
+
+    assert sorted(os.listdir(tmp_path)) == ["in-use.png"]
+    assert result.removed_bytes == 120
+    assert result.remaining_bytes == 60
+
+
+def test_janitor_ignores_missing_directory(tmp_path) -> None:
+    janitor = TempJanitor(str(tmp_path / "missing"))
+
+    assert asyncio.run(janitor.sweep()).removed_files == 0